@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import time
+
+from ingest_sink import run_sink
+from log_generator import (
+    ReliableSender,
+    TrafficModel,
+    run_connections,
+    run_load,
+    select_generator,
+)
+
+MODES = ["python", "numpy", "reliable", "connections"]
+
+
+def run_mode(mode, host, port, args):
+    """Send events with send timestamps in one generator mode
+
+    python and numpy are the load mode with each generator, reliable adds
+    --reliable and connections uses --connections, both with the default
+    generator. Returns the generator's result dict.
+    """
+    model = TrafficModel(seed=args.seed) if args.seed is not None else None
+    generator = mode if mode in ("python", "numpy") else "auto"
+    options = dict(
+        host=host,
+        port=port,
+        rate=args.rate,
+        batch_size=args.batch_size,
+        duration=args.duration,
+        report_interval=args.duration + 1,  # Only the final summary
+        generate=select_generator(generator, model),
+        timestamps=True,
+    )
+    if mode == "connections":
+        return asyncio.run(
+            run_connections(connections=args.connections, seed=args.seed, **options)
+        )
+    sender = ReliableSender(host, port) if mode == "reliable" else None
+    return run_load(sender=sender, **options)
+
+
+def wait_for_delivery(control, sent, settle):
+    """Wait until sent events arrived or none arrived for settle seconds"""
+    control.send("snapshot")
+    received = control.recv()
+    last_change = time.perf_counter()
+    while received["events"] < sent and time.perf_counter() - last_change < settle:
+        time.sleep(0.2)
+        control.send("snapshot")
+        snapshot = control.recv()
+        if snapshot["events"] != received["events"]:
+            last_change = time.perf_counter()
+        received = snapshot
+    return received
+
+
+def milliseconds(seconds):
+    return f"{seconds * 1000:.1f}" if seconds is not None else "-"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Measure throughput, delivery latency and drops of each "
+        "log_generator.py mode against ingest_sink.py, or through Logstash"
+    )
+    parser.add_argument(
+        "--modes",
+        default=",".join(MODES),
+        help=f"Comma-separated modes to run (default: {','.join(MODES)})",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=20000,
+        help="Target events/sec of each run (default: 20000)",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=10.0,
+        help="Seconds each mode sends for (default: 10)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="Maximum events per write (default: 500)",
+    )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=100,
+        help="Connections of the connections mode (default: 100)",
+    )
+    parser.add_argument("--seed", type=int, help="Seed for reproducible events")
+    parser.add_argument(
+        "--sink-host",
+        default="127.0.0.1",
+        help="Address the sink listens on (default: 127.0.0.1)",
+    )
+    parser.add_argument(
+        "--sink-port",
+        type=int,
+        default=5055,
+        help="Port the sink listens on (default: 5055)",
+    )
+    parser.add_argument(
+        "--target",
+        metavar="HOST:PORT",
+        help="Send to this Logstash instead of straight to the sink; its "
+        "output must forward to the sink",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=5.0,
+        help="Seconds without new arrivals before counting missing events as "
+        "dropped (default: 5)",
+    )
+    parser.add_argument("--json", metavar="FILE", help="Also write results as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    control, sink_control = multiprocessing.Pipe()
+    sink = multiprocessing.Process(
+        target=run_sink,
+        args=(args.sink_host, args.sink_port, 3600.0, sink_control),
+        daemon=True,
+    )
+    sink.start()
+    time.sleep(0.5)
+    if args.target:
+        host, port = args.target.rsplit(":", 1)
+        port = int(port)
+    else:
+        host, port = args.sink_host, args.sink_port
+
+    results = []
+    for mode in args.modes.split(","):
+        if mode == "numpy":
+            try:
+                select_generator("numpy")
+            except Exception:
+                logging.warning("Skipping numpy mode, NumPy is not installed")
+                continue
+        logging.info(f"Running {mode} mode at {args.rate:,.0f} events/sec")
+        control.send("reset")
+        control.recv()
+        sent = run_mode(mode, host, port, args)
+        received = wait_for_delivery(control, sent["events"], args.settle)
+        results.append(
+            {
+                "mode": mode,
+                "target_rate": args.rate,
+                "sent": sent["events"],
+                "sent_rate": sent["achieved_rate"],
+                "received": received["events"],
+                "received_rate": received["events_per_second"],
+                "dropped": sent["events"] - received["events"],
+                "p50": received["p50"],
+                "p99": received["p99"],
+                "max": received["max"],
+            }
+        )
+
+    print()
+    print(
+        f"{'mode':<12} {'sent/s':>10} {'received/s':>11} {'dropped':>9} "
+        f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    )
+    for result in results:
+        print(
+            f"{result['mode']:<12} {result['sent_rate']:>10,.0f} "
+            f"{result['received_rate']:>11,.0f} {result['dropped']:>9,} "
+            f"{milliseconds(result['p50']):>8} {milliseconds(result['p99']):>8} "
+            f"{milliseconds(result['max']):>8}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sink.terminate()
@@ -0,0 +1,178 @@
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Counters:
+    """Totals shared by the request handler threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.indexed = 0
+        self.rejected = 0
+        self.errors = 0
+        self.failed_requests = 0
+
+
+def make_handler(counters, reject_rate, error_rate, fail_rate, latency):
+    """Create a handler answering _bulk requests like Elasticsearch would"""
+
+    class BulkHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def reply(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self.reply(
+                200,
+                {
+                    "name": "es-bulk-stub",
+                    "cluster_name": "docker-cluster",
+                    "version": {"number": "8.12.0"},
+                    "tagline": "You Know, for Search",
+                },
+            )
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not self.path.split("?")[0].endswith("/_bulk"):
+                self.reply(404, {"error": "only _bulk is supported", "status": 404})
+                return
+
+            start = time.perf_counter()
+            if latency:
+                time.sleep(latency / 1000)
+            if random.random() < fail_rate:
+                with counters.lock:
+                    counters.failed_requests += 1
+                self.reply(
+                    503, {"error": "unavailable_shards_exception", "status": 503}
+                )
+                return
+
+            # Every other line is an action, followed by its document
+            lines = body.splitlines()
+            items = []
+            for action in lines[::2]:
+                index = json.loads(action)["index"].get("_index", "logs")
+                roll = random.random()
+                if roll < reject_rate:
+                    item = {
+                        "_index": index,
+                        "status": 429,
+                        "error": {
+                            "type": "es_rejected_execution_exception",
+                            "reason": "rejected execution of coordinating operation",
+                        },
+                    }
+                elif roll < reject_rate + error_rate:
+                    item = {
+                        "_index": index,
+                        "status": 400,
+                        "error": {
+                            "type": "mapper_parsing_exception",
+                            "reason": "failed to parse field [status_code]",
+                        },
+                    }
+                else:
+                    item = {"_index": index, "result": "created", "status": 201}
+                items.append({"index": item})
+
+            rejected = sum(item["index"]["status"] == 429 for item in items)
+            errors = sum(item["index"]["status"] == 400 for item in items)
+            with counters.lock:
+                counters.requests += 1
+                counters.indexed += len(items) - rejected - errors
+                counters.rejected += rejected
+                counters.errors += errors
+            took = int((time.perf_counter() - start) * 1000)
+            self.reply(
+                200, {"took": took, "errors": bool(rejected or errors), "items": items}
+            )
+
+        def log_message(self, format, *args):
+            pass
+
+    return BulkHandler
+
+
+def report(counters, interval):
+    while True:
+        time.sleep(interval)
+        with counters.lock:
+            logging.info(
+                f"{counters.requests:,} bulk requests, {counters.indexed:,} indexed, "
+                f"{counters.rejected:,} rejected (429), {counters.errors:,} errors (400), "
+                f"{counters.failed_requests:,} failed requests (503)"
+            )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Stand-in for the Elasticsearch _bulk API, for testing "
+        "log_generator.py --es-url without a cluster"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument(
+        "--reject-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of documents rejected with 429 (default: 0)",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of documents failed with a 400 mapping error (default: 0)",
+    )
+    parser.add_argument(
+        "--fail-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of bulk requests failed with 503 (default: 0)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Milliseconds added to each bulk request (default: 0)",
+    )
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=5.0,
+        help="Seconds between counter reports (default: 5)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+    counters = Counters()
+    server = ThreadingHTTPServer(
+        (args.host, args.port),
+        make_handler(
+            counters, args.reject_rate, args.error_rate, args.fail_rate, args.latency
+        ),
+    )
+    threading.Thread(
+        target=report, args=(counters, args.report_interval), daemon=True
+    ).start()
+    logging.info(f"Serving _bulk on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
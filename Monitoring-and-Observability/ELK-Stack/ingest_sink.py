@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+import logging
+import math
+import re
+import time
+from collections import Counter
+
+# Send time added by log_generator.py --send-timestamps, with or without the
+# space, as Logstash writes JSON without one
+SENT_AT_RE = re.compile(rb'"sent_at":\s?(-?[0-9.]+(?:[eE][-+]?[0-9]+)?)')
+
+
+class LatencyHistogram:
+    """Delivery latencies in logarithmic buckets about 1% wide
+
+    Memory stays constant however many events arrive, and percentiles are
+    accurate to about 1%. Latencies below a microsecond, as from clocks
+    that are slightly off between hosts, count as a microsecond.
+    """
+
+    RESOLUTION = 100  # Buckets per factor of e
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, seconds):
+        seconds = max(seconds, 1e-6)
+        self.buckets[math.floor(math.log(seconds) * self.RESOLUTION)] += 1
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        """Latency in seconds below which percent of the events arrived"""
+        if not self.count:
+            return None
+        rank = percent / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                # Upper bound of the bucket
+                return min(math.exp((bucket + 1) / self.RESOLUTION), self.max)
+        return self.max
+
+
+class IngestStats:
+    """Counters of everything the sink received"""
+
+    def __init__(self):
+        self.reset()
+        self.connections = 0
+
+    def reset(self):
+        self.start = time.perf_counter()
+        self.events = 0
+        self.bytes = 0
+        self.connects = 0
+        self.latency = LatencyHistogram()
+        self.first_event = None
+        self.last_event = None
+
+    def snapshot(self):
+        """Return the counters as a dict"""
+        elapsed = (self.last_event or 0) - (self.first_event or 0)
+        return {
+            "events": self.events,
+            "bytes": self.bytes,
+            "connections": self.connections,
+            "connects": self.connects,
+            "timed_events": self.latency.count,
+            "events_per_second": self.events / elapsed if elapsed else 0.0,
+            "p50": self.latency.percentile(50),
+            "p99": self.latency.percentile(99),
+            "max": self.latency.max if self.latency.count else None,
+        }
+
+    def describe(self):
+        """Summarize the counters for logging"""
+        snapshot = self.snapshot()
+        text = (
+            f"{self.events:,} events ({self.bytes / 1e6:,.1f} MB), "
+            f"{snapshot['events_per_second']:,.0f} events/sec, "
+            f"{self.connections} connected"
+        )
+        if self.latency.count:
+            text += (
+                f", latency p50 {snapshot['p50'] * 1000:.1f} ms, "
+                f"p99 {snapshot['p99'] * 1000:.1f} ms, "
+                f"max {snapshot['max'] * 1000:.1f} ms"
+            )
+        return text
+
+
+async def receive(reader, writer, stats):
+    """Count the JSON lines of one connection and their latencies"""
+    stats.connections += 1
+    stats.connects += 1
+    pending = b""  # Incomplete last line of the previous read
+    try:
+        while True:
+            chunk = await reader.read(1 << 16)
+            if not chunk:
+                break
+            now = time.time()
+            if stats.first_event is None:
+                stats.first_event = time.perf_counter()
+            stats.last_event = time.perf_counter()
+            stats.bytes += len(chunk)
+            stats.events += chunk.count(b"\n")
+
+            data = pending + chunk
+            end = data.rfind(b"\n") + 1
+            pending = data[end:]
+            for sent_at in SENT_AT_RE.findall(data, 0, end):
+                stats.latency.add(now - float(sent_at))
+    except ConnectionError:
+        pass
+    finally:
+        stats.connections -= 1
+        writer.close()
+
+
+async def serve(host, port, stats, report_interval=5.0, control=None):
+    """Accept connections until cancelled, logging the counters
+
+    With a multiprocessing connection as control, answers the commands
+    "snapshot" and "reset" sent over it, for benchmark.py.
+    """
+    server = await asyncio.start_server(
+        lambda reader, writer: receive(reader, writer, stats), host, port
+    )
+    logging.info(f"Receiving JSON lines on {host}:{port}")
+
+    async def answer():
+        loop = asyncio.get_running_loop()
+        while True:
+            command = await loop.run_in_executor(None, control.recv)
+            if command == "reset":
+                stats.reset()
+            control.send(stats.snapshot())
+
+    if control is not None:
+        asyncio.ensure_future(answer())
+    async with server:
+        while True:
+            await asyncio.sleep(report_interval)
+            if stats.events:
+                logging.info(stats.describe())
+
+
+def run_sink(host, port, report_interval=5.0, control=None):
+    """Run the sink until interrupted, as the target of a separate process"""
+    try:
+        asyncio.run(serve(host, port, IngestStats(), report_interval, control))
+    except KeyboardInterrupt:
+        pass
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Stand-in for the Logstash tcp input with the json codec: "
+        "counts the JSON lines received and their delivery latency"
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument(
+        "--port", type=int, default=5000, help="TCP port (default: 5000)"
+    )
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=5.0,
+        help="Seconds between counter reports (default: 5)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+    run_sink(args.host, args.port, args.report_interval)
@@ -1,9 +1,25 @@
+import argparse
+import asyncio
+import base64
+import functools
+import gzip
+import http.client
+import itertools
 import json
 import logging
+import math
+import os
+import queue
 import random
+import re
+import select
 import socket
+import tempfile
+import threading
 import time
+from collections import deque
 from datetime import datetime
+from urllib.parse import unquote, urlsplit
 
 # List of sample log messages and events
 SAMPLE_EVENTS = [
@@ -20,39 +36,353 @@ SAMPLE_EVENTS = [
 LOG_LEVELS = ["INFO", "WARNING", "ERROR", "DEBUG"]
 STATUS_CODES = [200, 201, 400, 401, 403, 404, 500, 503]
 USER_IDS = list(range(1, 1001))  # User IDs from 1 to 1000
+API_RESOURCES = ["users", "products", "orders"]
+HTTP_METHODS = ["GET", "POST", "PUT", "DELETE"]
+SOURCE_IPS = 255 * 255  # 192.168.1.1 to 192.168.255.255
+EVENT_DRAWS = 11  # Uniform numbers drawn per event by generate_log_batch
+DRAW_CHUNK = 4096  # Events drawn from the NumPy generator at a time
 
 
-def generate_random_log():
-    """Generate a random log entry"""
+def zipf_cum_weights(count, skew):
+    """Cumulative weights of count keys, key k weighing 1/k**skew"""
+    return list(itertools.accumulate(1 / k**skew for k in range(1, count + 1)))
+
+
+class TrafficModel:
+    """Distributions of keys, status codes and rate of generated events
+
+    User IDs and source IPs are drawn from users and ips distinct values,
+    uniformly or, with skew > 0, Zipf distributed: the k-th most frequent
+    key is picked in proportion to 1/k**skew, so a few hot keys dominate
+    as in production traffic. error_rate is the share of 4xx/5xx status
+    codes, all codes being equally likely when it is None.
+
+    The rate can follow a daily cycle, swinging by +/- diurnal around the
+    base rate over period seconds and starting at the low point. On top,
+    on average bursts times per hour, the rate is multiplied by
+    burst_factor for burst_seconds, with burst_error_rate errors meanwhile.
+    With a seed, the events and the burst schedule are reproducible.
+    """
+
+    def __init__(
+        self,
+        users=len(USER_IDS),
+        ips=SOURCE_IPS,
+        skew=0.0,
+        error_rate=None,
+        diurnal=0.0,
+        period=86400.0,
+        bursts=0.0,
+        burst_factor=5.0,
+        burst_seconds=30.0,
+        burst_error_rate=0.5,
+        seed=None,
+    ):
+        if not 0 <= diurnal < 1:
+            raise ValueError("diurnal must be at least 0 and below 1")
+        if not 1 <= ips <= SOURCE_IPS:
+            raise ValueError(f"ips must be between 1 and {SOURCE_IPS}")
+        self.users = users
+        self.ips = ips
+        self.skew = skew
+        self.error_rate = error_rate
+        self.diurnal = diurnal
+        self.period = period
+        self.bursts = bursts
+        self.burst_factor = burst_factor
+        self.burst_seconds = burst_seconds
+        self.burst_error_rate = burst_error_rate
+        self.seed = seed
+
+        self.random = random if seed is None else random.Random(seed)
+        self.ok_codes = [code for code in STATUS_CODES if code < 400]
+        self.error_codes = [code for code in STATUS_CODES if code >= 400]
+        self.user_weights = zipf_cum_weights(users, skew) if skew else None
+        self.ip_weights = zipf_cum_weights(ips, skew) if skew else None
+        self._numpy_state = None
+        self._draws = None
+        self._draws_used = 0
+
+        # Own generator, so the schedule does not depend on the event volume
+        self.schedule = random.Random(None if seed is None else f"bursts-{seed}")
+        self.start = None
+        self.next_burst = self._burst_gap() if bursts else None
+        self.in_burst = False
+
+    def _burst_gap(self):
+        return self.schedule.expovariate(self.bursts / 3600)
+
+    def _key(self, count, cum_weights):
+        if cum_weights:
+            return self.random.choices(range(count), cum_weights=cum_weights)[0]
+        return self.random.randrange(count)
+
+    def user_id(self):
+        return self._key(self.users, self.user_weights) + 1
+
+    def source_ip(self):
+        index = self._key(self.ips, self.ip_weights)
+        return f"192.168.{index // 255 + 1}.{index % 255 + 1}"
+
+    def current_error_rate(self):
+        """Share of error status codes now, or None for all codes alike"""
+        return self.burst_error_rate if self.in_burst else self.error_rate
+
+    def status_code(self):
+        error_rate = self.current_error_rate()
+        if error_rate is None:
+            return self.random.choice(STATUS_CODES)
+        if self.random.random() < error_rate:
+            return self.random.choice(self.error_codes)
+        return self.random.choice(self.ok_codes)
+
+    def rate_factor(self, now):
+        """Multiplier of the base rate at time.perf_counter() value now
+
+        The first call marks the start of the daily cycle. Also updates
+        whether a burst is under way.
+        """
+        if self.start is None:
+            self.start = now
+        elapsed = now - self.start
+        factor = 1 - self.diurnal * math.cos(2 * math.pi * elapsed / self.period)
+
+        self.in_burst = False
+        if self.bursts:
+            while elapsed >= self.next_burst + self.burst_seconds:
+                self.next_burst += self.burst_seconds + self._burst_gap()
+            if elapsed >= self.next_burst:
+                self.in_burst = True
+                factor *= self.burst_factor
+        return factor
+
+    def numpy_state(self, np):
+        """NumPy generator and cumulative key weights for generate_log_batch"""
+        if self._numpy_state is None:
+
+            def cum_weights(count):
+                if not self.skew:
+                    return None
+                return np.cumsum(1.0 / np.arange(1, count + 1) ** self.skew)
+
+            self._numpy_state = (
+                np.random.default_rng(self.seed),
+                cum_weights(self.users),
+                cum_weights(self.ips),
+            )
+        return self._numpy_state
+
+    def draws(self, np, count):
+        """Uniform numbers in [0, 1) for count events, EVENT_DRAWS per event
+
+        They are drawn from the generator DRAW_CHUNK events at a time and
+        handed out in order, so a seeded stream of events is the same however
+        it is split into batches.
+        """
+        rng = self.numpy_state(np)[0]
+        parts = []
+        while count:
+            if self._draws is None or self._draws_used == len(self._draws):
+                self._draws = rng.random((DRAW_CHUNK, EVENT_DRAWS))
+                self._draws_used = 0
+            part = self._draws[self._draws_used : self._draws_used + count]
+            self._draws_used += len(part)
+            count -= len(part)
+            parts.append(part)
+        if not parts:
+            return np.empty((0, EVENT_DRAWS))
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+
+DEFAULT_TRAFFIC = TrafficModel()
+
+
+def generate_random_log(event=None, model=None):
+    """Generate a random log entry, for a random event unless one is given
+
+    Values are drawn from the traffic model, uniformly unless one is given.
+    """
+    model = model or DEFAULT_TRAFFIC
+    rng = model.random
     timestamp = datetime.utcnow().isoformat()
-    event = random.choice(SAMPLE_EVENTS)
-    level = random.choice(LOG_LEVELS)
+    event = event or rng.choice(SAMPLE_EVENTS)
+    level = rng.choice(LOG_LEVELS)
 
     log_data = {
         "timestamp": timestamp,
         "level": level,
         "event": event,
         "details": {
-            "user_id": random.choice(USER_IDS),
-            "status_code": random.choice(STATUS_CODES),
-            "response_time": round(random.uniform(0.1, 2.0), 3),
-            "source_ip": f"192.168.{random.randint(1,255)}.{random.randint(1,255)}",
+            "user_id": model.user_id(),
+            "status_code": model.status_code(),
+            "response_time": round(rng.uniform(0.1, 2.0), 3),
+            "source_ip": model.source_ip(),
         },
     }
 
     # Add some conditional extra fields based on the event type
     if "API request" in event:
-        log_data["details"]["endpoint"] = (
-            f"/api/v1/{random.choice(['users', 'products', 'orders'])}"
-        )
-        log_data["details"]["method"] = random.choice(["GET", "POST", "PUT", "DELETE"])
+        log_data["details"]["endpoint"] = f"/api/v1/{rng.choice(API_RESOURCES)}"
+        log_data["details"]["method"] = rng.choice(HTTP_METHODS)
     elif "Database" in event:
-        log_data["details"]["query_time"] = round(random.uniform(0.01, 0.5), 3)
-        log_data["details"]["rows_affected"] = random.randint(1, 1000)
+        log_data["details"]["query_time"] = round(rng.uniform(0.01, 0.5), 3)
+        log_data["details"]["rows_affected"] = rng.randint(1, 1000)
 
     return log_data
 
 
+def generate_log_lines(count, weights=None, model=None):
+    """Generate count JSON log lines, one event at a time
+
+    Events are picked with the given relative weights per SAMPLE_EVENTS
+    entry, or uniformly. Other values are drawn from the traffic model.
+    """
+    rng = (model or DEFAULT_TRAFFIC).random
+    lines = []
+    for _ in range(count):
+        # Drawn per event, so a seeded stream does not depend on the batch size
+        event = rng.choices(SAMPLE_EVENTS, weights)[0] if weights else None
+        log_entry = generate_random_log(event, model)
+        log_entry["type"] = "app_logs"  # Add type field for Logstash filtering
+        lines.append(json.dumps(log_entry))
+    return lines
+
+
+def load_numpy():
+    """Import NumPy, which is only needed for vectorized generation"""
+    try:
+        import numpy
+    except ImportError as e:
+        raise Exception(
+            "NumPy is required for vectorized generation. Install it with:\n"
+            "pip install numpy"
+        ) from e
+    return numpy
+
+
+def build_log_templates():
+    """Build a str.format template per event type for generate_log_batch
+
+    The templates are made by json.dumps of an entry with the structure of
+    generate_random_log, with placeholders for the random fields, so they
+    render exactly what json.dumps would. Positional fields are: timestamp,
+    level, user_id, status_code, response_time, the two source_ip octets,
+    endpoint resource, method, query_time and rows_affected.
+    """
+
+    def number(index):
+        return f"@@#{index}@@"  # Unquoted after substitution
+
+    templates = []
+    for event in SAMPLE_EVENTS:
+        log_data = {
+            "timestamp": "@@0@@",
+            "level": "@@1@@",
+            "event": event,
+            "details": {
+                "user_id": number(2),
+                "status_code": number(3),
+                "response_time": number(4),
+                "source_ip": "192.168.@@5@@.@@6@@",
+            },
+        }
+        if "API request" in event:
+            log_data["details"]["endpoint"] = "/api/v1/@@7@@"
+            log_data["details"]["method"] = "@@8@@"
+        elif "Database" in event:
+            log_data["details"]["query_time"] = number(9)
+            log_data["details"]["rows_affected"] = number(10)
+        log_data["type"] = "app_logs"
+
+        template = json.dumps(log_data).replace("{", "{{").replace("}", "}}")
+        template = re.sub(r'"@@#(\d+)@@"', r"{\1}", template)
+        templates.append(re.sub(r"@@(\d+)@@", r"{\1}", template))
+    return templates
+
+
+_log_templates = None
+
+
+def generate_log_batch(count, weights=None, model=None):
+    """Generate count JSON log lines at once with NumPy
+
+    All random fields of the batch are derived from one array of uniform
+    numbers, a fixed number per event, and rendered through precompiled
+    per-event templates, which is several times faster than
+    generate_log_lines. The lines have the same structure and value ranges,
+    but all events of a batch share one timestamp.
+    """
+    global _log_templates
+    np = load_numpy()
+    if _log_templates is None:
+        _log_templates = build_log_templates()
+    model = model or DEFAULT_TRAFFIC
+    _, user_weights, ip_weights = model.numpy_state(np)
+    (
+        event_draws,
+        level_draws,
+        user_draws,
+        error_draws,
+        status_draws,
+        response_draws,
+        ip_draws,
+        resource_draws,
+        method_draws,
+        query_draws,
+        rows_draws,
+    ) = model.draws(np, count).T
+
+    def integers(low, high, draws):
+        """Integers from low up to, not including, high"""
+        return low + np.minimum((draws * (high - low)).astype(np.int64), high - low - 1)
+
+    def pick(values, draws):
+        return np.asarray(values)[integers(0, len(values), draws)]
+
+    def keys(cardinality, cum_weights, draws):
+        if cum_weights is None:
+            return integers(0, cardinality, draws)
+        indexes = np.searchsorted(cum_weights, draws * cum_weights[-1])
+        return np.minimum(indexes, cardinality - 1)
+
+    error_rate = model.current_error_rate()
+    if error_rate is None:
+        status_codes = pick(STATUS_CODES, status_draws)
+    else:
+        status_codes = np.where(
+            error_draws < error_rate,
+            pick(model.error_codes, status_draws),
+            pick(model.ok_codes, status_draws),
+        )
+    ips = keys(model.ips, ip_weights, ip_draws)
+
+    if weights:
+        cum_weights = np.cumsum(np.asarray(weights, dtype=float))
+        events = np.minimum(
+            np.searchsorted(cum_weights, event_draws * cum_weights[-1], "right"),
+            len(SAMPLE_EVENTS) - 1,
+        )
+    else:
+        events = integers(0, len(SAMPLE_EVENTS), event_draws)
+
+    columns = zip(
+        events.tolist(),
+        pick(LOG_LEVELS, level_draws).tolist(),
+        (keys(model.users, user_weights, user_draws) + 1).tolist(),
+        status_codes.tolist(),
+        (integers(100, 2001, response_draws) / 1000).tolist(),  # 0.1-2.0s
+        (ips // 255 + 1).tolist(),
+        (ips % 255 + 1).tolist(),
+        pick(API_RESOURCES, resource_draws).tolist(),
+        pick(HTTP_METHODS, method_draws).tolist(),
+        (integers(10, 501, query_draws) / 1000).tolist(),  # 0.01-0.5s
+        integers(1, 1001, rows_draws).tolist(),
+    )
+    timestamp = datetime.utcnow().isoformat()
+    templates = _log_templates
+    return [templates[event].format(timestamp, *fields) for event, *fields in columns]
+
+
 def send_log(host="localhost", port=5000):
     """Send log to Logstash via TCP"""
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -73,14 +403,1340 @@ def send_log(host="localhost", port=5000):
         sock.close()
 
 
+def connect(host, port):
+    """Open a TCP connection, exiting with an error message if refused"""
+    try:
+        return socket.create_connection((host, port))
+    except OSError as e:
+        logging.error(f"Connection to {host}:{port} failed: {e}")
+        raise SystemExit(1) from None
+
+
+class TokenBucket:
+    """Token bucket that refills at a fixed rate, up to a maximum burst"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = 0.0
+        self.last = time.perf_counter()
+
+    def _refill(self):
+        now = time.perf_counter()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def take(self, count):
+        """Take up to count whole tokens and return how many were taken"""
+        self._refill()
+        taken = min(count, int(self.tokens))
+        self.tokens -= taken
+        return taken
+
+    def wait_time(self, count):
+        """Seconds until count tokens are available"""
+        self._refill()
+        return max(0.0, (min(count, self.capacity) - self.tokens) / self.rate)
+
+    def consume(self, count):
+        """Take count tokens, going into debt, and return seconds to wait"""
+        self._refill()
+        self.tokens -= count
+        return max(0.0, -self.tokens / self.rate)
+
+
+def encode_lines(lines, timestamps=False):
+    """Join log lines into a message, adding the send time if asked
+
+    The send time is added as sent_at, in Unix seconds, for measuring
+    delivery latency with ingest_sink.py.
+    """
+    if timestamps:
+        suffix = f', "sent_at": {time.time():.6f}}}'
+        lines = [line[:-1] + suffix for line in lines]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def run_load(
+    host="localhost",
+    port=5000,
+    rate=1000,
+    batch_size=500,
+    flush_interval=0.05,
+    duration=None,
+    report_interval=5.0,
+    generate=generate_log_lines,
+    record=None,
+    sender=None,
+    traffic=None,
+    timestamps=False,
+):
+    """Send logs at a target rate (events/sec) in batched writes
+
+    Events are paced by a token bucket and written with one sendall per
+    batch. A batch is flushed when it is full or flush_interval seconds
+    after the previous flush, whichever comes first. Achieved versus target
+    rate is logged every report_interval seconds and returned at the end.
+    Lines are made by generate, generate_log_lines or generate_log_batch.
+    With record set to a file path, the stream is written to a recording
+    for replay_log instead of being sent. A sender such as ReliableSender
+    or BulkSender is used in place of a plain socket when given. With a
+    traffic model, the target rate follows its daily cycle and bursts.
+    With timestamps, each event gets its send time, see encode_lines.
+    """
+    bucket = TokenBucket(rate, capacity=max(1, batch_size))
+    target_events = 0.0
+    sent_events = sent_bytes = 0
+    buffer = []
+
+    if record:
+        sock = StreamRecorder(record)
+    elif sender is not None:
+        sock = sender
+    else:
+        sock = connect(host, port)
+    start = last_flush = last_report = last_tick = time.perf_counter()
+    reported_events = 0
+    deadline = start + duration if duration else None
+
+    try:
+        while deadline is None or time.perf_counter() < deadline:
+            now = time.perf_counter()
+            target_events += bucket.rate * (now - last_tick)
+            last_tick = now
+            if traffic is not None:
+                bucket.rate = rate * traffic.rate_factor(now)
+
+            count = bucket.take(batch_size - len(buffer))
+            if count:
+                buffer.extend(generate(count))
+
+            now = time.perf_counter()
+            if len(buffer) >= batch_size or (
+                buffer and now - last_flush >= flush_interval
+            ):
+                message = encode_lines(buffer, timestamps)
+                sock.sendall(message)
+                sent_events += len(buffer)
+                sent_bytes += len(message)
+                buffer.clear()
+                last_flush = now
+
+            if now - last_report >= report_interval:
+                logging.info(
+                    f"Achieved {(sent_events - reported_events) / (now - last_report):,.0f} "
+                    f"events/sec (target {bucket.rate:,.0f}), {sent_events:,} events sent"
+                    + (f", {sender.describe()}" if sender is not None else "")
+                )
+                last_report = now
+                reported_events = sent_events
+
+            # Sleep until a full batch is due or the pending batch must be flushed
+            wait = bucket.wait_time(batch_size - len(buffer))
+            if buffer:
+                wait = min(wait, last_flush + flush_interval - now)
+            if deadline is not None:
+                wait = min(wait, deadline - now)
+            if wait > 0:
+                time.sleep(wait)
+
+        if buffer:
+            message = encode_lines(buffer, timestamps)
+            sock.sendall(message)
+            sent_events += len(buffer)
+            sent_bytes += len(message)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+
+    elapsed = time.perf_counter() - start
+    achieved = sent_events / elapsed if elapsed else 0.0
+    if traffic is not None and elapsed:
+        rate = target_events / elapsed  # Average of the varying target
+    logging.info(
+        f"Sent {sent_events:,} events ({sent_bytes / 1e6:,.1f} MB) in {elapsed:.1f}s: "
+        f"{achieved:,.0f} events/sec achieved, {rate:,.0f} targeted "
+        f"({achieved / rate:.1%})"
+    )
+    if sender is not None:
+        logging.info(f"Delivered {sender.sent_events:,} events, {sender.describe()}")
+    return {
+        "events": sent_events,
+        "bytes": sent_bytes,
+        "seconds": elapsed,
+        "target_rate": rate,
+        "achieved_rate": achieved,
+        "sender": sender.stats() if sender is not None else None,
+    }
+
+
+def open_recording(path, mode):
+    """Open a recording as text, gzip-compressed if the path ends in .gz"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8", buffering=1 << 20)
+
+
+class StreamRecorder:
+    """Socket stand-in that writes sent log lines to an NDJSON recording
+
+    Each line of the recording is a JSON array of the send time in seconds
+    since the start of the recording and the log entry, e.g.
+    [0.051023, {"timestamp": ...}]
+    """
+
+    def __init__(self, path):
+        self.file = open_recording(path, "w")
+        self.start = time.perf_counter()
+
+    def sendall(self, message):
+        offset = f"[{time.perf_counter() - self.start:.6f}, "
+        lines = message.decode().splitlines()
+        self.file.write("".join(f"{offset}{line}]\n" for line in lines))
+
+    def close(self):
+        self.file.close()
+
+
+class ReliableSender:
+    """Socket stand-in that buffers logs and survives Logstash restarts
+
+    sendall only queues the message; a background thread writes it to
+    Logstash, reconnecting with exponential backoff when the connection
+    drops. A batch whose write failed is sent again, so it may arrive twice.
+    Messages are queued in memory up to max_queue events, and then spilled
+    to files in spill_dir. Only messages beyond spill_limit bytes on disk
+    are dropped. A message stays queued, or on disk, until its write
+    succeeds.
+
+    New messages go to memory whenever there is room, so once Logstash is
+    back live traffic is sent straight away and the backlog on disk is
+    replayed in between, oldest first, at no more than catch_up_rate
+    events/sec if set. Spilled events therefore arrive after newer ones.
+    The spill is split into segments of an eighth of spill_limit, each
+    deleted once it has been replayed.
+
+    Before each write the connection is checked for a close by the peer.
+    Data that the kernel accepted just before the connection broke can
+    still be lost, as the Logstash tcp input sends no acknowledgements.
+    """
+
+    def __init__(
+        self,
+        host="localhost",
+        port=5000,
+        max_queue=100000,
+        spill_dir=None,
+        spill_limit=1 << 30,
+        catch_up_rate=None,
+        max_backoff=30.0,
+    ):
+        self.address = (host, port)
+        self.max_queue = max_queue
+        self.spill_dir = spill_dir
+        self.spill_limit = spill_limit
+        self.segment_size = max(spill_limit // 8, 1)
+        self.bucket = TokenBucket(catch_up_rate, 0) if catch_up_rate else None
+        self.max_backoff = max_backoff
+
+        self.condition = threading.Condition()
+        self.queue = deque()  # (message, events), oldest first
+        self.queued_events = 0
+        self.segments = deque()  # [path, file, size] of spill files, oldest first
+        self.spill_read = 0  # Byte offset of the next message in the oldest one
+        self.spill_bytes = 0  # Bytes in all spill files, replayed or not
+        self.spilled_events = 0
+        self.replay_at = 0.0  # time.monotonic() when spilled events may be sent
+        self.closing = False
+        self.close_deadline = None
+
+        self.sent_events = 0
+        self.dropped_events = 0
+        self.reconnects = 0
+        self.connected = False
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def sendall(self, message):
+        """Queue a message of newline-terminated log lines"""
+        events = message.count(b"\n")
+        with self.condition:
+            if self.queued_events + events <= self.max_queue:
+                self.queue.append((message, events))
+                self.queued_events += events
+            elif self.spill_bytes + len(message) <= self.spill_limit:
+                self._spill(message)
+                self.spilled_events += events
+            else:
+                self.dropped_events += events
+            self.condition.notify()
+
+    def _spill(self, message):
+        if not self.segments or self.segments[-1][2] >= self.segment_size:
+            fd, path = tempfile.mkstemp(
+                prefix="log_generator-", suffix=".spill", dir=self.spill_dir
+            )
+            self.segments.append([path, os.fdopen(fd, "w+b"), 0])
+        segment = self.segments[-1]
+        segment[1].seek(segment[2])
+        segment[1].write(message)
+        segment[2] += len(message)
+        self.spill_bytes += len(message)
+
+    def _unspill(self, size=1 << 20):
+        """Read whole lines from the oldest spill file, at most about size bytes
+
+        The lines stay on disk until _done removes them.
+        """
+        _, file, segment_size = self.segments[0]
+        file.seek(self.spill_read)
+        data = file.read(min(size, segment_size - self.spill_read))
+        end = data.rfind(b"\n") + 1
+        if not end:  # A line longer than size
+            data += file.readline()
+            end = len(data)
+        data = data[:end]
+        return data, data.count(b"\n"), True
+
+    def _next(self):
+        """Wait for the next message to send, or None when closed and empty
+
+        Queued messages come first. Spilled ones are read back when the
+        catch-up rate allows. Returns (message, events, spilled). The message
+        still counts as queued until _done or _requeue is called with it.
+        """
+        with self.condition:
+            while True:
+                if self.queue:
+                    message, events = self.queue.popleft()
+                    return message, events, False
+                delay = None
+                if self.spilled_events:
+                    delay = self.replay_at - time.monotonic()
+                    if delay <= 0:
+                        return self._unspill()
+                elif self.closing:
+                    return None
+                self.condition.wait(delay)
+
+    def _done(self, message, events, spilled):
+        """Forget a message that was written"""
+        with self.condition:
+            if not spilled:
+                self.queued_events -= events
+                return
+            self.spill_read += len(message)
+            self.spilled_events -= events
+            path, file, segment_size = self.segments[0]
+            if self.spill_read == segment_size:
+                # Replayed entirely, new messages go to a newer segment
+                file.close()
+                os.remove(path)
+                self.segments.popleft()
+                self.spill_bytes -= segment_size
+                self.spill_read = 0
+
+    def _requeue(self, message, events, spilled):
+        """Put back a message whose write failed, in front of the others"""
+        if spilled:
+            return  # Still at the start of the oldest spill file
+        with self.condition:
+            # Its events were never released, so this stays within max_queue
+            self.queue.appendleft((message, events))
+
+    def _connect(self):
+        """Connect to Logstash, retrying with exponential backoff"""
+        backoff = 0.1
+        while True:
+            try:
+                sock = socket.create_connection(self.address, timeout=10)
+                sock.settimeout(None)
+                return sock
+            except OSError as e:
+                logging.debug(f"Connecting to {self.address} failed: {e}")
+                with self.condition:
+                    if self.closing and self.close_deadline <= time.monotonic():
+                        return None
+                time.sleep(backoff * random.uniform(0.5, 1.5))
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def _run(self):
+        sock = None
+        lost_at = None
+        draining_since = None
+        while True:
+            if sock is None:
+                sock = self._connect()
+                if sock is None:
+                    return
+                self.connected = True
+                if lost_at is not None:
+                    self.reconnects += 1
+                    logging.info(
+                        f"Reconnected after {time.monotonic() - lost_at:.1f}s, "
+                        f"{self.queued_events + self.spilled_events:,} events queued"
+                    )
+                    draining_since = time.monotonic()
+                    lost_at = None
+
+            item = self._next()
+            if item is None:
+                sock.close()
+                return
+            message, events, spilled = item
+
+            try:
+                # Logstash never writes back, so a readable socket means the
+                # peer closed it; writing now would silently lose the message
+                if select.select([sock], [], [], 0)[0]:
+                    raise ConnectionResetError("connection closed by peer")
+                sock.sendall(message)
+            except OSError as e:
+                logging.warning(f"Connection lost ({e}), buffering events")
+                self._requeue(message, events, spilled)
+                sock.close()
+                sock = None
+                self.connected = False
+                lost_at = time.monotonic()
+                continue
+
+            self._done(message, events, spilled)
+            self.sent_events += events
+            if draining_since is not None and not (
+                self.queued_events or self.spilled_events
+            ):
+                logging.info(
+                    f"Backlog drained {time.monotonic() - draining_since:.1f}s "
+                    "after reconnecting"
+                )
+                draining_since = None
+            if spilled and self.bucket is not None:
+                with self.condition:
+                    self.replay_at = time.monotonic() + self.bucket.consume(events)
+
+    def describe(self):
+        """Summarize the queue and connection counters for logging"""
+        return (
+            f"{'connected' if self.connected else 'disconnected'}, "
+            f"{self.queued_events:,} queued in memory, "
+            f"{self.spilled_events:,} spilled to disk, "
+            f"{self.dropped_events:,} dropped, {self.reconnects} reconnects"
+        )
+
+    def stats(self):
+        """Return the queue and connection counters"""
+        return {
+            "sent_events": self.sent_events,
+            "queued_events": self.queued_events,
+            "spilled_events": self.spilled_events,
+            "spilled_bytes": self.spill_bytes,
+            "dropped_events": self.dropped_events,
+            "reconnects": self.reconnects,
+            "connected": self.connected,
+        }
+
+    def close(self, timeout=30.0):
+        """Send the backlog, waiting up to timeout seconds, and stop"""
+        with self.condition:
+            self.closing = True
+            self.close_deadline = time.monotonic() + timeout
+            self.condition.notify()
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            logging.warning(
+                f"Gave up on {self.queued_events + self.spilled_events:,} "
+                "queued events"
+            )
+        with self.condition:
+            while self.segments:
+                path, file, _ = self.segments.popleft()
+                file.close()
+                os.remove(path)
+
+
+class BulkSender:
+    """Socket stand-in that indexes logs straight into Elasticsearch
+
+    Bypasses Logstash to measure Elasticsearch indexing on its own. Each log
+    line becomes a document in the daily index (logs-YYYY.MM.dd by default,
+    the same as logstash.conf) with an @timestamp added, as Logstash would.
+    Documents are sent with the _bulk API in requests of up to max_bytes,
+    or whatever has accumulated after flush_interval seconds. Up to
+    concurrency requests are in flight, each worker keeping its own
+    keep-alive connection; sendall blocks when all workers are busy.
+
+    Documents rejected with 429 or 5xx, in a failed request or as items of
+    a partially failed one, are retried with exponential backoff up to
+    max_retries times, as are the documents of a request whose response
+    cannot be read. Other item errors, such as mapping conflicts, are
+    counted as failed and not retried.
+    """
+
+    def __init__(
+        self,
+        url="http://localhost:9200",
+        index="logs-%Y.%m.%d",
+        max_bytes=5 << 20,
+        flush_interval=1.0,
+        concurrency=4,
+        max_retries=5,
+    ):
+        parts = urlsplit(url)
+        self.connection_class = (
+            http.client.HTTPSConnection
+            if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.address = (parts.hostname, parts.port)
+        self.path = parts.path.rstrip("/") + "/_bulk"
+        self.headers = {"Content-Type": "application/x-ndjson"}
+        if parts.username:
+            credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+            self.headers["Authorization"] = (
+                "Basic " + base64.b64encode(credentials.encode()).decode()
+            )
+        self.index = index
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self.lock = threading.Lock()
+        self.pending = []  # Action and document line pairs of the next request
+        self.pending_bytes = 0
+        self.pending_since = None
+        self.requests = queue.Queue(maxsize=concurrency)
+        self.local = threading.local()  # Connection of each worker
+        self.closed = threading.Event()
+
+        self.indexed = 0
+        self.failed = 0
+        self.retried = 0
+        self.request_count = 0
+        self.request_seconds = 0.0
+        self.first_error = None
+
+        self.workers = [
+            threading.Thread(target=self._work, daemon=True) for _ in range(concurrency)
+        ]
+        self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        for thread in self.workers + [self.flusher]:
+            thread.start()
+
+    @property
+    def sent_events(self):
+        return self.indexed
+
+    def sendall(self, message):
+        """Add newline-terminated log lines to the next bulk request"""
+        now = datetime.utcnow()
+        action = json.dumps({"index": {"_index": now.strftime(self.index)}})
+        timestamp = f', "@timestamp": "{now.isoformat(timespec="milliseconds")}Z"}}'
+        docs = [
+            f"{action}\n{line[:-1]}{timestamp}\n"
+            for line in message.decode().splitlines()
+        ]
+
+        with self.lock:
+            self.pending.extend(docs)
+            self.pending_bytes += sum(len(doc) for doc in docs)
+            if self.pending_since is None:
+                self.pending_since = time.monotonic()
+            batch = self._take() if self.pending_bytes >= self.max_bytes else None
+        if batch:
+            self.requests.put(batch)
+
+    def _take(self):
+        """Take the pending documents, called with the lock held"""
+        batch = self.pending
+        self.pending = []
+        self.pending_bytes = 0
+        self.pending_since = None
+        return batch
+
+    def _flush_periodically(self):
+        while not self.closed.wait(self.flush_interval / 4):
+            with self.lock:
+                batch = None
+                if (
+                    self.pending
+                    and time.monotonic() - self.pending_since >= self.flush_interval
+                ):
+                    batch = self._take()
+            if batch:
+                self.requests.put(batch)
+
+    def _work(self):
+        while True:
+            batch = self.requests.get()
+            if batch is None:
+                break
+            self._index(batch)
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+
+    def _post(self, body):
+        """POST a bulk request on this worker's connection"""
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.connection_class(*self.address, timeout=60)
+            self.local.connection = connection
+        try:
+            start = time.perf_counter()
+            connection.request("POST", self.path, body, self.headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self.local.connection = None
+            raise
+        with self.lock:
+            self.request_count += 1
+            self.request_seconds += time.perf_counter() - start
+        return response.status, data
+
+    def _index(self, docs):
+        """Send documents, retrying the ones rejected with 429 or 5xx"""
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                with self.lock:
+                    self.retried += len(docs)
+                time.sleep(min(0.1 * 2**attempt, 10.0) * random.uniform(0.5, 1.5))
+
+            try:
+                status, data = self._post("".join(docs).encode())
+            except (OSError, http.client.HTTPException) as e:
+                logging.debug(f"Bulk request failed: {e}")
+                continue
+            if status == 429 or status >= 500:
+                continue
+            if status != 200:
+                self._fail(
+                    len(docs), f"HTTP {status}: {data[:200].decode(errors='replace')}"
+                )
+                return
+
+            try:
+                result = json.loads(data)
+                items = result["items"] if result.get("errors") else None
+            except (ValueError, KeyError, AttributeError) as e:
+                # A truncated or non-JSON body, e.g. from a proxy: whether the
+                # documents were indexed is unknown, so send them again
+                logging.debug(f"Unreadable bulk response: {e}")
+                continue
+            if items is None:
+                with self.lock:
+                    self.indexed += len(docs)
+                return
+            if len(items) != len(docs):
+                logging.debug(f"Bulk response has {len(items)} of {len(docs)} items")
+                continue
+
+            retry = []
+            indexed = 0
+            for doc, item in zip(docs, items):
+                outcome = next(iter(item.values()))
+                item_status = outcome.get("status", 500)
+                if item_status < 300:
+                    indexed += 1
+                elif item_status == 429 or item_status >= 500:
+                    retry.append(doc)
+                else:
+                    error = outcome.get("error", {})
+                    self._fail(1, f"{error.get('type')}: {error.get('reason')}")
+            with self.lock:
+                self.indexed += indexed
+            docs = retry
+            if not docs:
+                return
+
+        self._fail(len(docs), f"gave up after {self.max_retries} retries")
+
+    def _fail(self, count, reason):
+        with self.lock:
+            self.failed += count
+            if self.first_error is None:
+                self.first_error = reason
+                logging.warning(f"Documents failed to index: {reason}")
+
+    def describe(self):
+        """Summarize the indexing counters for logging"""
+        latency = self.request_seconds / self.request_count if self.request_count else 0
+        return (
+            f"{self.indexed:,} indexed, {self.failed:,} failed, "
+            f"{self.retried:,} retried, {self.request_count:,} bulk requests "
+            f"({latency * 1000:.0f} ms avg), {self.requests.qsize()} waiting"
+        )
+
+    def stats(self):
+        """Return the indexing counters"""
+        return {
+            "indexed": self.indexed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "requests": self.request_count,
+            "request_seconds": self.request_seconds,
+            "first_error": self.first_error,
+        }
+
+    def close(self, timeout=60.0):
+        """Send the pending documents and wait for in-flight requests"""
+        self.closed.set()
+        self.flusher.join()
+        with self.lock:
+            batch = self._take()
+        if batch:
+            self.requests.put(batch)
+        for _ in self.workers:
+            self.requests.put(None)
+        deadline = time.monotonic() + timeout
+        for thread in self.workers:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+
+def replay_log(
+    path,
+    host="localhost",
+    port=5000,
+    speed=1.0,
+    batch_size=500,
+    report_interval=5.0,
+):
+    """Send a recording made with --record, keeping its timing
+
+    With speed 1 events are sent at their recorded times, 10 or 100 replays
+    10x or 100x faster, and 0 sends as fast as possible. The recording is
+    streamed in chunks, so captures larger than memory can be replayed.
+    Events that are due are sent in batches of up to batch_size.
+    """
+    sock = connect(host, port)
+    sent_events = sent_bytes = 0
+    buffer = []
+    max_lag = 0.0
+    offset = 0.0
+
+    def flush():
+        nonlocal sent_events, sent_bytes
+        message = ("\n".join(buffer) + "\n").encode()
+        sock.sendall(message)
+        sent_events += len(buffer)
+        sent_bytes += len(message)
+        buffer.clear()
+
+    start = last_report = time.perf_counter()
+    reported_events = 0
+    try:
+        with open_recording(path, "r") as f:
+            for line in f:
+                # Split "[offset, {...}]" without parsing the entry
+                separator = line.index(", ")
+                offset = float(line[1:separator])
+
+                if speed:
+                    now = time.perf_counter()
+                    due = start + offset / speed
+                    if due > now:
+                        # Send what is due before waiting for this event
+                        if buffer:
+                            flush()
+                        time.sleep(max(0.0, due - time.perf_counter()))
+                    else:
+                        max_lag = max(max_lag, now - due)
+
+                buffer.append(line[separator + 2 :].rstrip("\n")[:-1])
+                if len(buffer) >= batch_size:
+                    flush()
+
+                now = time.perf_counter()
+                if now - last_report >= report_interval:
+                    logging.info(
+                        f"Replayed {sent_events:,} events, "
+                        f"{(sent_events - reported_events) / (now - last_report):,.0f} "
+                        f"events/sec, {offset:.1f}s into the recording"
+                    )
+                    last_report = now
+                    reported_events = sent_events
+        if buffer:
+            flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+
+    elapsed = time.perf_counter() - start
+    logging.info(
+        f"Replayed {sent_events:,} events ({sent_bytes / 1e6:,.1f} MB) in "
+        f"{elapsed:.1f}s: {sent_events / elapsed if elapsed else 0:,.0f} events/sec, "
+        f"{offset / elapsed if elapsed else 0:.1f}x recorded speed, "
+        f"max lag behind schedule {max_lag:.3f}s"
+    )
+    return {
+        "events": sent_events,
+        "bytes": sent_bytes,
+        "seconds": elapsed,
+        "recorded_seconds": offset,
+        "max_lag": max_lag,
+    }
+
+
+class ConnectionStats:
+    """Counters of one simulated shipper connection"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.events = 0
+        self.bytes = 0
+        self.connects = 0
+        self.errors = 0
+        self.drain_seconds = 0.0  # Time spent blocked on backpressure
+        self.connected = False
+
+
+async def run_connection(
+    index,
+    host,
+    port,
+    stats,
+    weights,
+    batch_size,
+    flush_interval,
+    ramp_up,
+    generate,
+    traffic=None,
+    timestamps=False,
+):
+    """Send logs over one connection at its own rate and event mix
+
+    Reconnects with exponential backoff when the connection fails, without
+    blocking the other connections. Events in a failed write are lost.
+    """
+    bucket = TokenBucket(stats.rate, capacity=max(1, batch_size))
+    backoff = 0.1
+    # Spread the initial connects so the listener is not flooded at once
+    await asyncio.sleep(random.uniform(0, ramp_up))
+
+    while True:
+        writer = None
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            stats.connects += 1
+            stats.connected = True
+            backoff = 0.1
+
+            bucket.take(batch_size)  # Do not catch up on time spent connecting
+            while True:
+                await asyncio.sleep(min(bucket.wait_time(batch_size), flush_interval))
+                if traffic is not None:
+                    bucket.rate = stats.rate * traffic.rate_factor(time.perf_counter())
+                count = bucket.take(batch_size)
+                if not count:
+                    continue
+                message = encode_lines(generate(count, weights), timestamps)
+
+                writer.write(message)
+                start = time.perf_counter()
+                await writer.drain()
+                stats.drain_seconds += time.perf_counter() - start
+                stats.events += count
+                stats.bytes += len(message)
+        except OSError as e:
+            stats.errors += 1
+            logging.debug(f"Connection {index} failed: {e}")
+        finally:
+            stats.connected = False
+            if writer is not None:
+                writer.close()
+
+        await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+        backoff = min(backoff * 2, 10.0)
+
+
+async def run_connections(
+    host="localhost",
+    port=5000,
+    connections=100,
+    rate=1000,
+    rate_spread=0.0,
+    batch_size=500,
+    flush_interval=0.05,
+    duration=None,
+    report_interval=5.0,
+    ramp_up=1.0,
+    seed=None,
+    generate=generate_log_lines,
+    traffic=None,
+    timestamps=False,
+):
+    """Simulate many concurrent shippers, each on its own connection
+
+    The total rate is split across the connections, each rate varied by up
+    to +/- rate_spread, and every connection gets its own mix of events.
+    Logs connection counts, backpressure and achieved versus target rate
+    every report_interval seconds. traffic and timestamps are as for
+    run_load.
+    """
+    rng = random.Random(seed)
+    factors = [
+        rng.uniform(1 - rate_spread, 1 + rate_spread) for _ in range(connections)
+    ]
+    stats = [ConnectionStats(rate * factor / sum(factors)) for factor in factors]
+
+    tasks = [
+        asyncio.ensure_future(
+            run_connection(
+                index,
+                host,
+                port,
+                connection_stats,
+                [rng.expovariate(1.0) for _ in SAMPLE_EVENTS],
+                batch_size,
+                flush_interval,
+                ramp_up,
+                generate,
+                traffic,
+                timestamps,
+            )
+        )
+        for index, connection_stats in enumerate(stats)
+    ]
+
+    start = last_report = time.perf_counter()
+    reported_events = 0
+    try:
+        while duration is None or time.perf_counter() - start < duration:
+            wait = report_interval
+            if duration is not None:
+                wait = min(wait, duration - (time.perf_counter() - start))
+            await asyncio.sleep(max(0.0, wait))
+
+            now = time.perf_counter()
+            if now - last_report < report_interval and (
+                duration is None or now - start < duration
+            ):
+                continue
+            events = sum(s.events for s in stats)
+            logging.info(
+                f"Achieved {(events - reported_events) / (now - last_report):,.0f} "
+                f"events/sec (target {rate:,.0f}), "
+                f"{sum(s.connected for s in stats)}/{connections} connected, "
+                f"{sum(s.errors for s in stats)} connection errors, "
+                f"max backpressure {max(s.drain_seconds for s in stats):.2f}s"
+            )
+            last_report = now
+            reported_events = events
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    elapsed = time.perf_counter() - start
+    events = sum(s.events for s in stats)
+    achieved = events / elapsed if elapsed else 0.0
+    logging.info(
+        f"Sent {events:,} events over {connections} connections in {elapsed:.1f}s: "
+        f"{achieved:,.0f} events/sec achieved, {rate:,.0f} targeted "
+        f"({achieved / rate:.1%}), {sum(s.connects for s in stats)} connects, "
+        f"{sum(s.errors for s in stats)} connection errors"
+    )
+    return {
+        "events": events,
+        "bytes": sum(s.bytes for s in stats),
+        "seconds": elapsed,
+        "target_rate": rate,
+        "achieved_rate": achieved,
+        "connects": sum(s.connects for s in stats),
+        "errors": sum(s.errors for s in stats),
+        "drain_seconds": [s.drain_seconds for s in stats],
+    }
+
+
+def create_sender(args):
+    """Create the sender for the load mode options, or None for a plain socket"""
+    if args.es_url:
+        return BulkSender(
+            url=args.es_url,
+            index=args.es_index,
+            max_bytes=args.bulk_size << 20,
+            flush_interval=args.bulk_interval,
+            concurrency=args.bulk_concurrency,
+        )
+    if args.reliable:
+        return ReliableSender(
+            host=args.host,
+            port=args.port,
+            max_queue=args.queue_size,
+            spill_dir=args.spill_dir,
+            spill_limit=args.spill_limit << 20,
+            catch_up_rate=args.catch_up_rate,
+        )
+    return None
+
+
+def create_traffic(args):
+    """Create the traffic model for the load mode options"""
+    return TrafficModel(
+        users=args.users,
+        ips=args.ips,
+        skew=args.skew,
+        error_rate=args.error_rate,
+        diurnal=args.diurnal,
+        period=args.day_length,
+        bursts=args.bursts,
+        burst_factor=args.burst_factor,
+        burst_seconds=args.burst_length,
+        burst_error_rate=args.burst_error_rate,
+        seed=args.seed,
+    )
+
+
+def select_generator(name, model=None):
+    """Return the line generator for numpy, python or auto
+
+    The generator draws from the given traffic model, if any.
+    """
+    generate = generate_log_lines
+    if name != "python":
+        try:
+            load_numpy()
+            generate = generate_log_batch
+        except Exception:
+            if name == "numpy":
+                raise
+            logging.info("NumPy is not installed, generating events one at a time")
+    return functools.partial(generate, model=model) if model else generate
+
+
+def parse_speed(value):
+    """Parse a replay speed, where max means as fast as possible"""
+    return 0.0 if value == "max" else float(value)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Generate sample application logs and send them to Logstash over TCP."
+    )
+    parser.add_argument(
+        "--host",
+        default="logstash",
+        help="Logstash host (default: logstash, the docker-compose service)",
+    )
+    parser.add_argument(
+        "--port", type=int, default=5000, help="Logstash TCP port (default: 5000)"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Load mode: send this many events/sec in batches instead of one "
+        "event every 1-5 seconds",
+    )
+    parser.add_argument(
+        "--reliable",
+        action="store_true",
+        help="Load mode: queue events while Logstash is unreachable and reconnect "
+        "with backoff instead of failing",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=100000,
+        help="Load mode with --reliable: events queued in memory before spilling "
+        "to disk (default: 100000)",
+    )
+    parser.add_argument(
+        "--spill-dir",
+        help="Load mode with --reliable: directory for the spill file "
+        "(default: the system temp directory)",
+    )
+    parser.add_argument(
+        "--spill-limit",
+        type=int,
+        default=1024,
+        help="Load mode with --reliable: MB of spill files on disk before events "
+        "are dropped (default: 1024)",
+    )
+    parser.add_argument(
+        "--catch-up-rate",
+        type=float,
+        help="Load mode with --reliable: maximum events/sec replayed from the "
+        "backlog spilled to disk, beside live traffic (default: unlimited)",
+    )
+    parser.add_argument(
+        "--es-url",
+        metavar="URL",
+        help="Load mode: index events straight into Elasticsearch at this URL "
+        "with the _bulk API, bypassing Logstash (e.g. http://localhost:9200)",
+    )
+    parser.add_argument(
+        "--es-index",
+        default="logs-%Y.%m.%d",
+        help="Load mode with --es-url: strftime pattern of the index name "
+        "(default: logs-%%Y.%%m.%%d, as in logstash.conf)",
+    )
+    parser.add_argument(
+        "--bulk-size",
+        type=int,
+        default=5,
+        help="Load mode with --es-url: MB per bulk request (default: 5)",
+    )
+    parser.add_argument(
+        "--bulk-interval",
+        type=float,
+        default=1.0,
+        help="Load mode with --es-url: maximum seconds before a partial bulk "
+        "request is sent (default: 1)",
+    )
+    parser.add_argument(
+        "--bulk-concurrency",
+        type=int,
+        default=4,
+        help="Load mode with --es-url: bulk requests in flight (default: 4)",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help="Load mode: write the generated stream with its timing to FILE "
+        "(compressed if it ends in .gz) instead of sending it",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="Send a stream recorded with --record, keeping its timing",
+    )
+    parser.add_argument(
+        "--speed",
+        type=parse_speed,
+        default=1.0,
+        help="Replay speed factor, e.g. 10 or 100, or max for as fast as "
+        "possible (default: 1, the recorded timing)",
+    )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        help="Load mode: simulate this many concurrent shippers, each on its own "
+        "connection with its own rate and event mix (requires --rate)",
+    )
+    parser.add_argument(
+        "--rate-spread",
+        type=float,
+        default=0.0,
+        help="Load mode with --connections: vary per-connection rates by up to "
+        "this fraction, e.g. 0.5 for +/-50%% (default: 0, equal rates)",
+    )
+    parser.add_argument(
+        "--ramp-up",
+        type=float,
+        default=1.0,
+        help="Load mode with --connections: spread the initial connects over "
+        "this many seconds (default: 1)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Load mode: seed for reproducible events and bursts, and with "
+        "--connections for per-connection rates and event mixes",
+    )
+    parser.add_argument(
+        "--users",
+        type=int,
+        default=len(USER_IDS),
+        help=f"Load mode: distinct user IDs (default: {len(USER_IDS)})",
+    )
+    parser.add_argument(
+        "--ips",
+        type=int,
+        default=SOURCE_IPS,
+        help=f"Load mode: distinct source IPs, up to {SOURCE_IPS} (default: all)",
+    )
+    parser.add_argument(
+        "--skew",
+        type=float,
+        default=0.0,
+        help="Load mode: Zipf exponent of user IDs and source IPs, e.g. 1.1 for "
+        "a few very hot keys (default: 0, uniform)",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        help="Load mode: share of 4xx/5xx status codes (default: all status "
+        "codes equally likely)",
+    )
+    parser.add_argument(
+        "--diurnal",
+        type=float,
+        default=0.0,
+        help="Load mode: swing the rate by this fraction (0-1) around --rate "
+        "in a daily cycle (default: 0)",
+    )
+    parser.add_argument(
+        "--day-length",
+        type=float,
+        default=86400.0,
+        help="Load mode with --diurnal: seconds per simulated day (default: 86400)",
+    )
+    parser.add_argument(
+        "--bursts",
+        type=float,
+        default=0.0,
+        help="Load mode: average traffic bursts per hour (default: 0)",
+    )
+    parser.add_argument(
+        "--burst-factor",
+        type=float,
+        default=5.0,
+        help="Load mode with --bursts: rate multiplier during a burst (default: 5)",
+    )
+    parser.add_argument(
+        "--burst-length",
+        type=float,
+        default=30.0,
+        help="Load mode with --bursts: seconds per burst (default: 30)",
+    )
+    parser.add_argument(
+        "--burst-error-rate",
+        type=float,
+        default=0.5,
+        help="Load mode with --bursts: share of error status codes during a "
+        "burst (default: 0.5)",
+    )
+    parser.add_argument(
+        "--send-timestamps",
+        action="store_true",
+        help="Load mode: add the send time (sent_at) to each event, for "
+        "measuring delivery latency with ingest_sink.py",
+    )
+    parser.add_argument(
+        "--generator",
+        choices=["auto", "numpy", "python"],
+        default="auto",
+        help="Load mode: generate events in vectorized batches with NumPy, or one "
+        "at a time in Python (default: auto, NumPy if installed)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="Load mode: maximum events per write (default: 500)",
+    )
+    parser.add_argument(
+        "--flush-interval",
+        type=float,
+        default=0.05,
+        help="Load mode: maximum seconds a partial batch is held back (default: 0.05)",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        help="Load mode: stop after this many seconds (default: run until Ctrl+C)",
+    )
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=5.0,
+        help="Load mode: seconds between rate reports (default: 5)",
+    )
+    args = parser.parse_args()
+
+    # The Logstash queue does not apply to Elasticsearch, whose bulk requests
+    # are retried by BulkSender itself
+    reliable_options = [
+        f"--{name.replace('_', '-')}"
+        for name in (
+            "reliable",
+            "queue_size",
+            "spill_dir",
+            "spill_limit",
+            "catch_up_rate",
+        )
+        if getattr(args, name) != parser.get_default(name)
+    ]
+    if args.es_url and reliable_options:
+        raise SystemExit(
+            f"--es-url cannot be used with {', '.join(reliable_options)}: "
+            "failed bulk requests are retried instead"
+        )
+    return args
+
+
 if __name__ == "__main__":
+    args = parse_args()
     logging.basicConfig(level=logging.INFO)
     logging.info("Starting log generator...")
 
+    if args.replay:
+        replay_log(
+            args.replay,
+            host=args.host,
+            port=args.port,
+            speed=args.speed,
+            batch_size=args.batch_size,
+            report_interval=args.report_interval,
+        )
+        raise SystemExit(0)
+
+    if args.record and (
+        args.connections or args.reliable or args.es_url or not args.rate
+    ):
+        raise SystemExit(
+            "--record requires --rate and cannot be used with --connections, "
+            "--reliable or --es-url"
+        )
+
+    if args.es_url and (args.connections or not args.rate):
+        raise SystemExit(
+            "--es-url requires --rate and cannot be used with --connections"
+        )
+
+    traffic = create_traffic(args)
+
+    if args.connections:
+        if not args.rate:
+            raise SystemExit("--connections requires --rate")
+        try:
+            asyncio.run(
+                run_connections(
+                    host=args.host,
+                    port=args.port,
+                    connections=args.connections,
+                    rate=args.rate,
+                    rate_spread=args.rate_spread,
+                    batch_size=args.batch_size,
+                    flush_interval=args.flush_interval,
+                    duration=args.duration,
+                    report_interval=args.report_interval,
+                    ramp_up=args.ramp_up,
+                    seed=args.seed,
+                    generate=select_generator(args.generator, traffic),
+                    traffic=traffic,
+                    timestamps=args.send_timestamps,
+                )
+            )
+        except KeyboardInterrupt:
+            pass
+        raise SystemExit(0)
+
+    if args.rate:
+        run_load(
+            host=args.host,
+            port=args.port,
+            rate=args.rate,
+            batch_size=args.batch_size,
+            flush_interval=args.flush_interval,
+            duration=args.duration,
+            report_interval=args.report_interval,
+            generate=select_generator(args.generator, traffic),
+            record=args.record,
+            sender=create_sender(args),
+            traffic=traffic,
+            timestamps=args.send_timestamps,
+        )
+        raise SystemExit(0)
+
     # Add retry logic for container orchestration
     while True:
         try:
-            send_log(host="logstash")  # Use service name from docker-compose
+            send_log(host=args.host, port=args.port)
             time.sleep(5)  # Wait before retrying
         except Exception as e:
             logging.error(f"Connection failed: {e}")
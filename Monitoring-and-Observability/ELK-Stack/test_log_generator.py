@@ -0,0 +1,140 @@
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+import log_generator
+from log_generator import (
+    ReliableSender,
+    TrafficModel,
+    generate_log_batch,
+    generate_log_lines,
+)
+
+GENERATORS = [generate_log_batch, generate_log_lines]
+WEIGHTS = [index % 3 for index in range(len(log_generator.SAMPLE_EVENTS))]
+
+
+def events(lines):
+    """Parse log lines, leaving out the clock-dependent timestamp"""
+    entries = [json.loads(line) for line in lines]
+    for entry in entries:
+        del entry["timestamp"]
+    return entries
+
+
+def model():
+    return TrafficModel(users=100000, skew=1.1, error_rate=0.05, seed=42)
+
+
+@pytest.mark.parametrize("generate", GENERATORS)
+@pytest.mark.parametrize("weights", [None, WEIGHTS])
+@pytest.mark.parametrize("sizes", [[10, 10], [1, 7, 12], [3000, 2000, 1]])
+def test_seeded_stream_does_not_depend_on_batch_sizes(generate, weights, sizes):
+    whole = generate(sum(sizes), weights, model())
+
+    split_model = model()
+    split = []
+    for size in sizes:
+        split += generate(size, weights, split_model)
+
+    assert events(split) == events(whole)
+
+
+def test_batch_matches_the_structure_of_single_events():
+    entries = events(generate_log_batch(2000, model=model()))
+
+    for entry in entries:
+        expected = log_generator.generate_random_log(entry["event"])
+        assert entry["level"] in log_generator.LOG_LEVELS
+        assert entry["details"].keys() == expected["details"].keys()
+    details = [entry["details"] for entry in entries]
+    assert {d["status_code"] for d in details} == set(log_generator.STATUS_CODES)
+    assert all(0.1 <= d["response_time"] <= 2.0 for d in details)
+    assert all(1 <= d["user_id"] <= 100000 for d in details)
+    assert all(1 <= d["rows_affected"] <= 1000 for d in details if "rows_affected" in d)
+
+
+def test_zero_weight_events_are_never_generated():
+    weights = [0] * len(log_generator.SAMPLE_EVENTS)
+    weights[3] = 1
+    for generate in GENERATORS:
+        entries = events(generate(500, weights, model()))
+        assert {entry["event"] for entry in entries} == {log_generator.SAMPLE_EVENTS[3]}
+
+
+class Receiver:
+    """Logstash stand-in that collects the lines sent to it"""
+
+    def __init__(self, port):
+        self.server = socket.create_server(("127.0.0.1", port))
+        self.data = bytearray()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        connection, _ = self.server.accept()
+        with connection:
+            while chunk := connection.recv(1 << 16):
+                self.data += chunk
+
+    def lines(self):
+        self.thread.join(10)
+        self.server.close()
+        return self.data.splitlines()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_reliable_sender_replays_spill_within_limit_beside_live_traffic(tmp_path):
+    port = free_port()
+    limit = 64 << 10
+    sender = ReliableSender(
+        "127.0.0.1",
+        port,
+        max_queue=100,
+        spill_dir=str(tmp_path),
+        spill_limit=limit,
+        catch_up_rate=2000,
+        max_backoff=0.2,
+    )
+    sent = 0
+    disk_usage = []
+
+    def send(messages):
+        nonlocal sent
+        for _ in range(messages):
+            lines = [
+                b'{"n": %06d, "pad": "%s"}\n' % (n, b"x" * 24)
+                for n in range(sent, sent + 10)
+            ]
+            sender.sendall(b"".join(lines))
+            sent += 10
+            disk_usage.append(sum(f.stat().st_size for f in tmp_path.iterdir()))
+
+    # Logstash is down: 100 events stay in memory, the rest is spilled
+    send(100)
+    assert sender.stats()["spilled_events"] == 900
+
+    # Live traffic at twice the catch-up rate once it is back
+    receiver = Receiver(port)
+    while not sender.connected:
+        time.sleep(0.01)
+    start = time.monotonic()
+    while time.monotonic() - start < 2:
+        send(4)
+        time.sleep(0.01)
+    assert sender.stats()["spilled_events"] == 0
+    sender.close()
+
+    assert max(disk_usage) <= limit
+    assert sender.stats()["dropped_events"] == 0
+    received = {int(line[6:12]) for line in receiver.lines()}
+    assert received == set(range(sent))
+    assert list(tmp_path.iterdir()) == []
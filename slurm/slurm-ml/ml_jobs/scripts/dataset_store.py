@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# Datasets are materialized once into the shared volume and memory mapped by
+# every job, rank and worker that needs them
+STORE_DIR = Path(os.getenv("DATASET_STORE", "/shared/datasets"))
+
+
+def dataset_path(name, params, store_dir=STORE_DIR):
+    """Directory of the dataset built by name with params"""
+    key = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+    return Path(store_dir) / f"{name}-{key}"
+
+
+def materialize(name, build, params, store_dir=STORE_DIR):
+    """Build a dataset into the store unless it is there, and return its path
+
+    build(create, **params) fills the arrays it makes with create(key,
+    shape, dtype), which returns a writable memmap, so datasets larger than
+    memory can be written in chunks. The arrays are saved as key.npy next
+    to a manifest.json describing them. The dataset is built in a temporary
+    directory that is renamed into place, so concurrent jobs never see a
+    partial dataset. If several build it at once, the first rename wins.
+    """
+    path = dataset_path(name, params, store_dir)
+    if (path / "manifest.json").exists():
+        return path
+
+    Path(store_dir).mkdir(parents=True, exist_ok=True)
+    temporary = Path(tempfile.mkdtemp(prefix=f".{name}-", dir=store_dir))
+    arrays = {}
+
+    def create(key, shape, dtype):
+        arrays[key] = np.lib.format.open_memmap(
+            temporary / f"{key}.npy", mode="w+", dtype=dtype, shape=shape
+        )
+        return arrays[key]
+
+    try:
+        build(create, **params)
+        manifest = {
+            "name": name,
+            "params": params,
+            "created": datetime.now().isoformat(),
+            "arrays": {
+                key: {
+                    "file": f"{key}.npy",
+                    "shape": list(array.shape),
+                    "dtype": array.dtype.str,
+                }
+                for key, array in arrays.items()
+            },
+        }
+        for array in arrays.values():
+            array.flush()
+        (temporary / "manifest.json").write_text(json.dumps(manifest, indent=2))
+        temporary.chmod(0o755)  # mkdtemp makes it private
+    except BaseException:
+        shutil.rmtree(temporary)
+        raise
+
+    try:
+        os.rename(temporary, path)
+    except OSError:
+        shutil.rmtree(temporary)
+        if not (path / "manifest.json").exists():
+            raise
+        # Another job materialized it first
+    return path
+
+
+def load_manifest(path):
+    """Return the manifest of a materialized dataset"""
+    return json.loads((Path(path) / "manifest.json").read_text())
+
+
+def open_arrays(path):
+    """Open the arrays of a materialized dataset as read-only memmaps"""
+    manifest = load_manifest(path)
+    return {
+        key: np.load(Path(path) / info["file"], mmap_mode="r")
+        for key, info in manifest["arrays"].items()
+    }
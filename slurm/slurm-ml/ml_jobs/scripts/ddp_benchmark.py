@@ -0,0 +1,153 @@
+import argparse
+import contextlib
+import itertools
+import os
+import time
+from pathlib import Path
+
+import torch
+import torch.distributed as dist
+import torch.nn.functional as F
+
+from distributed_train import (
+    COMM_HOOKS,
+    SimpleModel,
+    configure_cpu,
+    setup_distributed,
+    wrap_model,
+)
+
+
+def time_steps(model, optimizer, data, target, steps, accumulation_steps, sync):
+    """Seconds per optimizer step, slowest rank
+
+    With sync False, every backward runs under no_sync, so the time is
+    compute only.
+    """
+    dist.barrier()
+    start = time.perf_counter()
+    for _ in range(steps):
+        for micro_step in range(accumulation_steps):
+            last = sync and micro_step == accumulation_steps - 1
+            with contextlib.nullcontext() if last else model.no_sync():
+                loss = F.cross_entropy(model(data), target) / accumulation_steps
+                loss.backward()
+        optimizer.step()
+        optimizer.zero_grad()
+    elapsed = torch.tensor([(time.perf_counter() - start) / steps])
+    dist.all_reduce(elapsed, op=dist.ReduceOp.MAX)
+    return elapsed.item()
+
+
+def benchmark(args, device, hook, bucket_cap_mb, accumulation_steps):
+    """Return compute and total seconds per optimizer step for one setting"""
+    torch.manual_seed(0)
+    model = SimpleModel(args.input_size, args.hidden_size).to(device)
+    model = wrap_model(model, bucket_cap_mb, hook, args.powersgd_rank)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.01)
+    data = torch.randn(args.batch_size, args.input_size, device=device)
+    target = torch.randint(0, 2, (args.batch_size,), device=device)
+
+    # Warm up, also past the plain all-reduce steps PowerSGD starts with
+    time_steps(model, optimizer, data, target, args.warmup, accumulation_steps, True)
+    compute = time_steps(
+        model, optimizer, data, target, args.steps, accumulation_steps, False
+    )
+    total = time_steps(
+        model, optimizer, data, target, args.steps, accumulation_steps, True
+    )
+    return compute, total
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare DDP communication and compute time per setting"
+    )
+    parser.add_argument(
+        "--hooks",
+        default=",".join(COMM_HOOKS),
+        help=f"Comma-separated comm hooks (default: {','.join(COMM_HOOKS)})",
+    )
+    parser.add_argument(
+        "--bucket-caps",
+        default="1,25",
+        help="Comma-separated DDP bucket sizes in MB (default: 1,25)",
+    )
+    parser.add_argument(
+        "--accumulation",
+        default="1,4",
+        help="Comma-separated gradient accumulation steps (default: 1,4)",
+    )
+    parser.add_argument(
+        "--hidden-size",
+        type=int,
+        default=1024,
+        help="Hidden layer size of SimpleModel, for more or fewer gradients "
+        "to all-reduce (default: 1024)",
+    )
+    parser.add_argument("--input-size", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--powersgd-rank", type=int, default=1)
+    parser.add_argument(
+        "--steps", type=int, default=30, help="Timed optimizer steps (default: 30)"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=12, help="Untimed steps first (default: 12)"
+    )
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--pin-cores", action="store_true")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    cpu_config = configure_cpu(args.threads, pin_cores=args.pin_cores)
+    rank, world_size, device, node_name = setup_distributed()
+
+    parameters = sum(
+        p.numel() for p in SimpleModel(args.input_size, args.hidden_size).parameters()
+    )
+    lines = [
+        f"World size: {world_size}, {cpu_config}, {parameters:,} parameters "
+        f"({parameters * 4 / 1e6:.1f} MB of fp32 gradients), batch size: "
+        f"{args.batch_size}",
+        f"{'hook':<9} {'bucket MB':>9} {'accum':>5} {'compute ms':>10} "
+        f"{'comm ms':>8} {'comm %':>6} {'samples/s':>10}",
+    ]
+    if rank == 0:
+        print(lines[0])
+        print(lines[1])
+
+    settings = itertools.product(
+        args.hooks.split(","),
+        [float(cap) for cap in args.bucket_caps.split(",")],
+        [int(steps) for steps in args.accumulation.split(",")],
+    )
+    for hook, bucket_cap_mb, accumulation_steps in settings:
+        compute, total = benchmark(
+            args, device, hook, bucket_cap_mb, accumulation_steps
+        )
+        # Communication not hidden behind the backward pass
+        communication = max(0.0, total - compute)
+        samples = args.batch_size * accumulation_steps * world_size / total
+        line = (
+            f"{hook:<9} {bucket_cap_mb:>9g} {accumulation_steps:>5} "
+            f"{compute * 1000:>10.2f} {communication * 1000:>8.2f} "
+            f"{100 * communication / total:>6.1f} {samples:>10,.0f}"
+        )
+        lines.append(line)
+        if rank == 0:
+            print(line, flush=True)
+
+    if rank == 0:
+        results_dir = Path("/shared/results")
+        results_dir.mkdir(parents=True, exist_ok=True)
+        job_id = os.getenv("SLURM_JOB_ID", "no_id")
+        (results_dir / f"ddp_benchmark_{job_id}.txt").write_text(
+            "\n".join(lines) + "\n"
+        )
+    dist.destroy_process_group()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,12 @@
+import argparse
+import contextlib
+import itertools
 import logging
 import os
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -8,10 +15,25 @@ import torch
 import torch.distributed as dist
 import torch.nn as nn
 import torch.nn.functional as F
+from torch.distributed.algorithms.ddp_comm_hooks import default_hooks, powerSGD_hook
 from torch.nn.parallel import DistributedDataParallel as DDP
-from torch.utils.data import DataLoader, TensorDataset
+from torch.utils.data import BatchSampler, DataLoader, Dataset
 from torch.utils.data.distributed import DistributedSampler
 
+from dataset_store import (
+    STORE_DIR,
+    dataset_path,
+    load_manifest,
+    materialize,
+    open_arrays,
+)
+
+# Exit status after checkpointing on a pre-emption warning, for the submit
+# script to requeue the job
+REQUEUE_EXIT_CODE = 3
+
+COMM_HOOKS = ["none", "fp16", "bf16", "powersgd"]
+
 
 def setup_logger(rank, world_size):
     """Setup logger for each node"""
@@ -49,6 +71,252 @@ class SimpleModel(nn.Module):
         return self.layer3(x)
 
 
+class TrainingMetrics:
+    """Loss and accuracy accumulated on the training device
+
+    The sums stay on the device, so training steps never wait for the host.
+    They are copied to the host only when read, and reduce combines them
+    across all ranks with a single all_reduce.
+    """
+
+    def __init__(self, device):
+        # Sample-weighted loss sum, correct predictions, samples
+        self.totals = torch.zeros(3, dtype=torch.float64, device=device)
+
+    @torch.no_grad()
+    def update(self, loss, output, target):
+        samples = target.size(0)
+        self.totals[0] += loss.detach() * samples
+        self.totals[1] += (output.argmax(dim=1) == target).sum()
+        self.totals[2] += samples
+
+    @staticmethod
+    def _summarize(totals):
+        loss_sum, correct, samples = totals.tolist()  # The only host sync
+        if not samples:
+            return 0.0, 0.0, 0
+        return loss_sum / samples, 100.0 * correct / samples, int(samples)
+
+    def compute(self):
+        """Return the mean loss, accuracy (%) and samples of this rank so far"""
+        return self._summarize(self.totals)
+
+    def reduce(self):
+        """Return the mean loss, accuracy (%) and samples over all ranks"""
+        totals = self.totals.clone()
+        dist.all_reduce(totals, op=dist.ReduceOp.SUM)
+        return self._summarize(totals)
+
+
+def copy_to_cpu(state):
+    """Copy the tensors of a (nested) state dict to the CPU"""
+    if isinstance(state, torch.Tensor):
+        return state.detach().to("cpu", copy=True)
+    if isinstance(state, dict):
+        return {key: copy_to_cpu(value) for key, value in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(copy_to_cpu(value) for value in state)
+    return state
+
+
+class CheckpointManager:
+    """Write checkpoints in the background and find the newest to resume from
+
+    save snapshots the state to CPU memory and returns, while a background
+    thread writes it to a temporary file that is renamed into place, so a
+    checkpoint is either complete or absent. Only the newest keep
+    checkpoints are kept. Only rank 0 writes, every rank can load.
+    """
+
+    def __init__(self, directory, rank, logger, keep=3):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.rank = rank
+        self.logger = logger
+        self.keep = keep
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = None
+
+        # Left over when a job was killed while writing
+        if rank == 0:
+            for temporary in self.directory.glob("checkpoint_*.tmp"):
+                temporary.unlink()
+
+    def checkpoints(self):
+        """Return the checkpoint files, oldest first"""
+        return sorted(self.directory.glob("checkpoint_*.pt"))
+
+    def save(self, model, optimizer, epoch, batch, **extra):
+        """Snapshot the training state to resume at batch of epoch
+
+        Waits for the previous checkpoint to be written first, so at most
+        one snapshot is held in memory.
+        """
+        if self.rank != 0:
+            return
+        self.wait()
+        checkpoint = {
+            # Position to resume from: sampler epoch and batches done in it
+            "epoch": epoch,
+            "batch": batch,
+            "model_state_dict": copy_to_cpu(model.state_dict()),
+            "optimizer_state_dict": copy_to_cpu(optimizer.state_dict()),
+            **extra,
+        }
+        path = self.directory / f"checkpoint_{epoch:04d}_{batch:06d}.pt"
+        self.pending = self.executor.submit(self._write, checkpoint, path)
+
+    def _write(self, checkpoint, path):
+        temporary = path.with_suffix(".tmp")
+        with temporary.open("wb") as f:
+            torch.save(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+        self.logger.info(f"Saved checkpoint {path}")
+
+        for old in self.checkpoints()[: -self.keep]:
+            old.unlink()
+
+    def wait(self):
+        """Wait until the pending checkpoint is written"""
+        if self.pending is not None:
+            try:
+                self.pending.result()
+            except Exception as e:
+                self.logger.error(f"Failed to write checkpoint: {e}")
+            self.pending = None
+
+    def load_latest(self):
+        """Load the newest readable checkpoint, or return None
+
+        Rank 0 picks the checkpoint and broadcasts its path, so all ranks
+        resume from the same one.
+        """
+        choice = [None]
+        checkpoint = None
+        if self.rank == 0:
+            for path in reversed(self.checkpoints()):
+                try:
+                    checkpoint = torch.load(path, map_location="cpu")
+                except Exception as e:
+                    self.logger.warning(f"Skipping unreadable checkpoint {path}: {e}")
+                    continue
+                choice[0] = str(path)
+                break
+        dist.broadcast_object_list(choice, src=0)
+        if choice[0] is None:
+            return None
+        self.logger.info(f"Resuming from checkpoint {choice[0]}")
+        if checkpoint is None:
+            checkpoint = torch.load(choice[0], map_location="cpu")
+        return checkpoint
+
+    def close(self):
+        self.wait()
+        self.executor.shutdown()
+
+
+class Preemption:
+    """Notice Slurm's pre-emption warning and stop all ranks together
+
+    Slurm sends SIGTERM before killing a pre-empted job, or the signal set
+    with --signal before the time limit. Ranks receive it at different
+    times, so stop_requested agrees on stopping with an all_reduce.
+    """
+
+    def __init__(self, device, signals=(signal.SIGTERM, signal.SIGUSR1)):
+        self.flag = torch.zeros(1, device=device)
+        self.received = None
+        for signum in signals:
+            signal.signal(signum, self._handle)
+
+    def _handle(self, signum, frame):
+        self.received = signal.Signals(signum).name
+
+    def stop_requested(self):
+        """Return whether any rank received a pre-emption signal"""
+        self.flag.fill_(1.0 if self.received else 0.0)
+        dist.all_reduce(self.flag, op=dist.ReduceOp.MAX)
+        return bool(self.flag.item())
+
+
+def ignore_preemption_signals(worker_id):
+    """Keep dataloader workers alive through Slurm's pre-emption warning
+
+    Slurm signals every process of the job step, and a worker dying on it
+    would fail the training loop before it can checkpoint. Workers still
+    exit when the training process does.
+    """
+    for signum in (signal.SIGTERM, signal.SIGUSR1):
+        signal.signal(signum, signal.SIG_IGN)
+
+
+def configure_cpu(threads=None, interop_threads=None, pin_cores=False):
+    """Size the CPU thread pools and pin this task to its share of cores
+
+    threads defaults to the CPUs Slurm allocated per task, so tasks sharing
+    a node do not oversubscribe it. With pin_cores, each task on a node is
+    pinned to its own consecutive block of cores, for nodes whose Slurm
+    does not bind tasks itself. Must run before any other torch work.
+    Returns a description for logging.
+    """
+    threads = threads or int(os.getenv("SLURM_CPUS_PER_TASK", "0")) or None
+    if pin_cores:
+        cores = sorted(os.sched_getaffinity(0))
+        per_task = threads or max(
+            1, len(cores) // int(os.getenv("SLURM_NTASKS_PER_NODE", "1"))
+        )
+        start = int(os.getenv("SLURM_LOCALID", "0")) * per_task % len(cores)
+        os.sched_setaffinity(0, cores[start : start + per_task])
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        torch.set_num_interop_threads(interop_threads)
+    return (
+        f"{torch.get_num_threads()} threads, "
+        f"{torch.get_num_interop_threads()} interop threads, "
+        f"cores {sorted(os.sched_getaffinity(0))}"
+    )
+
+
+def wrap_model(model, bucket_cap_mb=25, comm_hook="none", powersgd_rank=1):
+    """Wrap the model in DDP with the given gradient bucket size and hook
+
+    comm_hook compresses the gradients before they are all-reduced: fp16
+    and bf16 halve the traffic, powersgd sends a low-rank approximation of
+    matrix gradients with error feedback after 10 plain warm-up steps.
+
+    Gloo pairs collectives up by the order they are issued in, and PowerSGD
+    issues its later all-reduces from callbacks, which can run in another
+    order on each rank when several buckets are in flight. On gloo, each
+    bucket's PowerSGD all-reduces therefore finish before the next bucket
+    starts.
+    """
+    model = DDP(model, bucket_cap_mb=bucket_cap_mb)
+    if comm_hook == "fp16":
+        model.register_comm_hook(None, default_hooks.fp16_compress_hook)
+    elif comm_hook == "bf16":
+        model.register_comm_hook(None, default_hooks.bf16_compress_hook)
+    elif comm_hook == "powersgd":
+        state = powerSGD_hook.PowerSGDState(
+            process_group=None,
+            matrix_approximation_rank=powersgd_rank,
+            start_powerSGD_iter=10,
+        )
+        if dist.get_backend() == "gloo":
+
+            def _gloo_powersgd_hook(state, bucket):
+                future = powerSGD_hook.powerSGD_hook(state, bucket)
+                future.wait()
+                return future
+
+            model.register_comm_hook(state, _gloo_powersgd_hook)
+        else:
+            model.register_comm_hook(state, powerSGD_hook.powerSGD_hook)
+    return model
+
+
 def setup_distributed():
     """Initialize distributed training"""
     # Get world size and rank from Slurm
@@ -76,70 +344,239 @@ def setup_distributed():
     return rank, world_size, device, node_name
 
 
-def create_synthetic_dataset(num_samples=10000, input_size=20):
-    """Create a synthetic dataset for demonstration"""
-    X = np.random.randn(num_samples, input_size).astype(np.float32)
-    y = (X.sum(axis=1) > 0).astype(np.int64)
-    return torch.FloatTensor(X), torch.LongTensor(y)
+def create_synthetic_dataset(
+    create, num_samples=10000, input_size=20, seed=0, chunk_size=100000
+):
+    """Create a synthetic dataset for demonstration in the dataset store"""
+    X = create("X", (num_samples, input_size), np.float32)
+    y = create("y", (num_samples,), np.int64)
+    rng = np.random.default_rng(seed)
+    for start in range(0, num_samples, chunk_size):
+        stop = min(start + chunk_size, num_samples)
+        X[start:stop] = rng.standard_normal((stop - start, input_size), np.float32)
+        y[start:stop] = X[start:stop].sum(axis=1) > 0
+
+
+class MemmapDataset(Dataset):
+    """Samples read straight from the memmapped arrays of a stored dataset
+
+    Nothing is loaded up front, so the page cache holds a single copy per
+    node however many ranks and workers read it. Indexed with a list of
+    indices, returns the whole batch with one read per array.
+    """
+
+    def __init__(self, path, features="X", labels="y"):
+        self.path = path
+        self.features = features
+        self.labels = labels
+        self.length = load_manifest(path)["arrays"][labels]["shape"][0]
+        self.arrays = None  # Opened in the process that reads them
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, indices):
+        if self.arrays is None:
+            self.arrays = open_arrays(self.path)
+        indices = np.sort(indices)  # Read the memmaps in order
+        return (
+            torch.from_numpy(self.arrays[self.features][indices]),
+            torch.from_numpy(self.arrays[self.labels][indices]),
+        )
 
+    def __getstate__(self):
+        # Workers open the memmaps themselves rather than get copies
+        return {**self.__dict__, "arrays": None}
 
-def prepare_dataloader(rank, world_size, batch_size=32):
-    """Prepare distributed dataloader"""
-    # Create synthetic dataset
-    X, y = create_synthetic_dataset()
-    dataset = TensorDataset(X, y)
 
-    # Create distributed sampler
+class EpochBatchSampler(BatchSampler):
+    """Batches of a DistributedSampler, passing set_epoch on to it
+
+    set_epoch can also skip the first start_batch batches of the epoch, done
+    before a restart, so they are never loaded. len() still counts them.
+    """
+
+    start_batch = 0
+
+    def set_epoch(self, epoch, start_batch=0):
+        self.sampler.set_epoch(epoch)
+        self.start_batch = start_batch
+
+    def __iter__(self):
+        return itertools.islice(super().__iter__(), self.start_batch, None)
+
+
+def prepare_dataloader(
+    rank, world_size, batch_size=32, num_workers=2, store_dir=STORE_DIR
+):
+    """Prepare distributed dataloader"""
+    # Materialize the synthetic dataset once, then memory map it on every rank
+    params = {"num_samples": 10000, "input_size": 20, "seed": 0}
+    if rank == 0:
+        materialize("synthetic", create_synthetic_dataset, params, store_dir)
+    dist.barrier()
+    dataset = MemmapDataset(dataset_path("synthetic", params, store_dir))
+
+    # Create distributed sampler, batched so each batch is one dataset read
     sampler = DistributedSampler(
         dataset, num_replicas=world_size, rank=rank, shuffle=True
     )
+    batch_sampler = EpochBatchSampler(sampler, batch_size, drop_last=False)
 
     # Create dataloader
     dataloader = DataLoader(
         dataset,
-        batch_size=batch_size,
-        sampler=sampler,
-        num_workers=0,
+        batch_size=None,
+        sampler=batch_sampler,
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0,
+        worker_init_fn=ignore_preemption_signals,
         pin_memory=True if torch.cuda.is_available() else False,  # Set to False for CPU
     )
 
     return dataloader
 
 
-def train_epoch(model, dataloader, optimizer, epoch, rank, device, logger, node_name):
-    """Train for one epoch"""
+def train_epoch(
+    model,
+    dataloader,
+    optimizer,
+    epoch,
+    rank,
+    device,
+    logger,
+    node_name,
+    log_interval=10,
+    start_batch=0,
+    preemption=None,
+    bf16=False,
+    accumulation_steps=1,
+):
+    """Train for one epoch and return its TrainingMetrics and batches done
+
+    The dataloader starts at batch start_batch, its sampler skipping the
+    ones done before a restart (see EpochBatchSampler). Checks for
+    pre-emption every log_interval optimizer steps and stops early if
+    requested. With bf16, the forward pass runs under bfloat16 autocast.
+    Gradients are accumulated over accumulation_steps batches per optimizer
+    step, and only all-reduced on the last of them.
+    """
     model.train()
-    total_loss = 0
-    correct = 0
-    total = 0
+    metrics = TrainingMetrics(device)
+    optimizer.zero_grad()
+    steps = 0
 
-    for batch_idx, (data, target) in enumerate(dataloader):
+    for batch_idx, (data, target) in enumerate(dataloader, start_batch):
         # Move data to appropriate device
         data, target = data.to(device), target.to(device)
 
-        optimizer.zero_grad()
-        output = model(data)
-        loss = F.cross_entropy(output, target)
-        loss.backward()
-        optimizer.step()
+        # All-reduce the gradients only on the last batch of an optimizer step
+        done = batch_idx + 1
+        boundary = done % accumulation_steps == 0 or done == len(dataloader)
+        with contextlib.nullcontext() if boundary else model.no_sync():
+            with torch.autocast(device.type, dtype=torch.bfloat16, enabled=bf16):
+                output = model(data)
+                loss = F.cross_entropy(output, target)
+            (loss / accumulation_steps).backward()
 
-        total_loss += loss.item()
-        pred = output.argmax(dim=1, keepdim=True)
-        correct += pred.eq(target.view_as(pred)).sum().item()
-        total += target.size(0)
+        metrics.update(loss, output, target)
 
-        if batch_idx % 10 == 0:
+        if batch_idx % log_interval == 0:
+            running_loss, running_acc, _ = metrics.compute()
             msg = (
                 f"Node: {node_name} (Rank {rank}) - Epoch: {epoch}, "
-                f"Batch: {batch_idx}, Loss: {loss.item():.4f}, "
-                f"Acc: {100. * correct / total:.2f}%"
+                f"Batch: {batch_idx}, Loss: {running_loss:.4f}, "
+                f"Acc: {running_acc:.2f}%"
             )
             logger.info(msg)
 
-    return total_loss / len(dataloader), 100.0 * correct / total
+        if boundary:
+            optimizer.step()
+            optimizer.zero_grad()
+            steps += 1
+            if (
+                preemption is not None
+                and steps % log_interval == 0
+                and preemption.stop_requested()
+            ):
+                return metrics, batch_idx + 1
+
+    return metrics, len(dataloader)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Distributed training with DDP")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=32,
+        help="Samples per batch and rank (default: 32)",
+    )
+    parser.add_argument(
+        "--accumulation-steps",
+        type=int,
+        default=1,
+        help="Batches whose gradients are accumulated per optimizer step, "
+        "all-reduced only once (default: 1)",
+    )
+    parser.add_argument(
+        "--bucket-cap-mb",
+        type=float,
+        default=25,
+        help="DDP gradient bucket size in MB (default: 25)",
+    )
+    parser.add_argument(
+        "--comm-hook",
+        choices=COMM_HOOKS,
+        default="none",
+        help="Gradient compression before the all-reduce (default: none)",
+    )
+    parser.add_argument(
+        "--powersgd-rank",
+        type=int,
+        default=1,
+        help="Rank of the PowerSGD approximation (default: 1)",
+    )
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=2,
+        help="Dataloader worker processes per rank, kept across epochs "
+        "(default: 2, 0 loads in the training process)",
+    )
+    parser.add_argument(
+        "--dataset-dir",
+        type=Path,
+        default=STORE_DIR,
+        help=f"Dataset store directory (default: {STORE_DIR})",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="Intra-op threads per task (default: SLURM_CPUS_PER_TASK, or all "
+        "cores)",
+    )
+    parser.add_argument("--interop-threads", type=int, help="Inter-op threads per task")
+    parser.add_argument(
+        "--pin-cores",
+        action="store_true",
+        help="Pin each task on a node to its own block of cores",
+    )
+    parser.add_argument(
+        "--bf16",
+        action="store_true",
+        help="Run the forward pass under bfloat16 autocast",
+    )
+    parser.add_argument(
+        "--compile", action="store_true", help="Compile the model with torch.compile"
+    )
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+    cpu_config = configure_cpu(args.threads, args.interop_threads, args.pin_cores)
+
     # Initialize distributed setup
     rank, world_size, device, node_name = setup_distributed()
 
@@ -147,66 +584,154 @@ def main():
     logger = setup_logger(rank, world_size)
     logger.info(f"Starting training on node {node_name} with rank {rank}")
     logger.info(f"Device: {device}, World size: {world_size}")
+    logger.info(
+        f"CPU: {cpu_config}, bf16 autocast: {args.bf16}, compiled: {args.compile}"
+    )
+    logger.info(
+        f"Batch size: {args.batch_size} x {args.accumulation_steps} accumulation "
+        f"steps, bucket cap: {args.bucket_cap_mb} MB, comm hook: {args.comm_hook}"
+    )
 
     # Create necessary directories
-    model_dir = Path("/shared/models")
+    job_id = os.getenv("SLURM_JOB_ID", "no_id")
+    model_dir = Path(
+        os.getenv("CHECKPOINT_DIR", f"/shared/models/distributed_{job_id}")
+    )
     results_dir = Path("/shared/results")
     for d in [model_dir, results_dir]:
         d.mkdir(parents=True, exist_ok=True)
 
     # Initialize model and move to device
     model = SimpleModel().to(device)
-    model = DDP(model)
+    model = wrap_model(model, args.bucket_cap_mb, args.comm_hook, args.powersgd_rank)
+    # Checkpoints use the uncompiled model, so their keys do not depend on it
+    train_model = torch.compile(model) if args.compile else model
 
     # Setup optimizer
     optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
 
     # Prepare dataloader
-    dataloader = prepare_dataloader(rank, world_size)
+    dataloader = prepare_dataloader(
+        rank,
+        world_size,
+        batch_size=args.batch_size,
+        num_workers=args.num_workers,
+        store_dir=args.dataset_dir,
+    )
     logger.info(
         f"Node {node_name} (Rank {rank}): Dataloader prepared with {len(dataloader)} batches"
     )
 
     # Training loop
     num_epochs = 10
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    results_file = results_dir / f"distributed_training_results_{timestamp}.txt"
+
+    # Resume from the newest checkpoint after a requeue
+    checkpoints = CheckpointManager(model_dir, rank, logger)
+    preemption = Preemption(device)
+    start_epoch, start_batch = 0, 0
+    checkpoint = checkpoints.load_latest()
+    if checkpoint is not None:
+        model.load_state_dict(checkpoint["model_state_dict"])
+        optimizer.load_state_dict(checkpoint["optimizer_state_dict"])
+        start_epoch, start_batch = checkpoint["epoch"], checkpoint["batch"]
+
+    if start_epoch >= num_epochs:
+        # A rerun of a finished job: leave its results as they are
+        logger.info(
+            f"Node {node_name} (Rank {rank}): Training already completed "
+            f"{num_epochs} epochs in {model_dir}, nothing to do"
+        )
+        checkpoints.close()
+        dist.destroy_process_group()
+        return
+
+    # One results file per run, the runs that share the checkpoint directory,
+    # so a requeued job carries on with the same record
+    run_id = model_dir.name if os.getenv("CHECKPOINT_DIR") else job_id
+    results_file = results_dir / f"distributed_training_results_{run_id}.txt"
+    if rank == 0:
+        with results_file.open("a") as f:
+            if checkpoint is not None:
+                f.write(
+                    f"Resumed at epoch {start_epoch}, batch {start_batch} on "
+                    f"{datetime.now():%Y-%m-%d %H:%M:%S}\n"
+                )
+            f.write(
+                f"World size: {world_size}, {cpu_config}, bf16: {args.bf16}, "
+                f"compile: {args.compile}, batch size: {args.batch_size}, "
+                f"accumulation steps: {args.accumulation_steps}, "
+                f"bucket cap: {args.bucket_cap_mb} MB, comm hook: {args.comm_hook}\n"
+            )
 
     # Log initial information
-    logger.info(f"Node {node_name} (Rank {rank}): Starting training loop")
+    logger.info(
+        f"Node {node_name} (Rank {rank}): Starting training loop at epoch "
+        f"{start_epoch}, batch {start_batch}"
+    )
 
     # Training loop
-    for epoch in range(num_epochs):
-        # Set epoch for distributed sampler
-        dataloader.sampler.set_epoch(epoch)
+    preempted = False
+    for epoch in range(start_epoch, num_epochs):
+        # Set epoch for distributed sampler, skipping the batches already done
+        dataloader.sampler.set_epoch(epoch, start_batch if epoch == start_epoch else 0)
 
         # Train one epoch
-        loss, acc = train_epoch(
-            model, dataloader, optimizer, epoch, rank, device, logger, node_name
+        start = time.perf_counter()
+        metrics, batches_done = train_epoch(
+            train_model,
+            dataloader,
+            optimizer,
+            epoch,
+            rank,
+            device,
+            logger,
+            node_name,
+            start_batch=start_batch if epoch == start_epoch else 0,
+            preemption=preemption,
+            bf16=args.bf16,
+            accumulation_steps=args.accumulation_steps,
         )
+        elapsed = time.perf_counter() - start
+
+        if batches_done < len(dataloader):
+            logger.info(
+                f"Node {node_name} (Rank {rank}): Pre-empted at epoch {epoch}, "
+                f"batch {batches_done}, saving a checkpoint"
+            )
+            checkpoints.save(model, optimizer, epoch, batches_done, device=device.type)
+            preempted = True
+            break
 
-        # Log results
+        # Log results of this node and of all nodes together
+        local_loss, local_acc, local_samples = metrics.compute()
+        loss, acc, samples = metrics.reduce()
         logger.info(
             f"Node {node_name} (Rank {rank}): Epoch {epoch} completed - "
-            f"Loss: {loss:.4f}, Accuracy: {acc:.2f}%"
+            f"Loss: {local_loss:.4f}, Accuracy: {local_acc:.2f}%, "
+            f"Samples/sec: {local_samples / elapsed:.0f} "
+            f"(all ranks: Loss: {loss:.4f}, Accuracy: {acc:.2f}%, "
+            f"Samples/sec: {samples / elapsed:.0f})"
         )
 
         # Save results and checkpoint from rank 0 only
         if rank == 0:
             with results_file.open("a") as f:
-                f.write(f"Epoch: {epoch}, Loss: {loss:.4f}, Accuracy: {acc:.2f}%\n")
+                f.write(
+                    f"Epoch: {epoch}, Loss: {loss:.4f}, Accuracy: {acc:.2f}%, "
+                    f"Samples/sec: {samples / elapsed:.0f}\n"
+                )
+        checkpoints.save(model, optimizer, epoch + 1, 0, loss=loss, device=device.type)
 
-            checkpoint = {
-                "epoch": epoch,
-                "model_state_dict": model.state_dict(),
-                "optimizer_state_dict": optimizer.state_dict(),
-                "loss": loss,
-                "device": device.type,
-            }
-            torch.save(checkpoint, model_dir / f"model_checkpoint_epoch_{epoch}.pt")
+        if preemption.stop_requested():
+            preempted = True
+            break
 
-    logger.info(f"Node {node_name} (Rank {rank}): Training completed")
+    checkpoints.close()
     dist.destroy_process_group()
+    if preempted:
+        logger.info(f"Node {node_name} (Rank {rank}): Stopped for requeue")
+        sys.exit(REQUEUE_EXIT_CODE)
+    logger.info(f"Node {node_name} (Rank {rank}): Training completed")
 
 
 if __name__ == "__main__":
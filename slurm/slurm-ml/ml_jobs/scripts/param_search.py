@@ -1,11 +1,22 @@
 import json
 import os
 
-import numpy as np
 from sklearn.datasets import make_classification
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import cross_val_score
 
+from dataset_store import materialize, open_arrays
+
+
+def create_classification_dataset(create, n_samples, n_features, random_state):
+    """Create the classification dataset in the dataset store"""
+    X, y = make_classification(
+        n_samples=n_samples, n_features=n_features, random_state=random_state
+    )
+    create("X", X.shape, X.dtype)[:] = X
+    create("y", y.shape, y.dtype)[:] = y
+
+
 # Get Slurm array task ID
 task_id = int(os.getenv("SLURM_ARRAY_TASK_ID", "0"))
 
@@ -20,8 +31,14 @@ param_grid = [
 # Select parameters for this task
 params = param_grid[task_id]
 
-# Generate dataset
-X, y = make_classification(n_samples=10000, n_features=20)
+# Generate the dataset once for all array tasks, so they compare on the same data
+dataset = materialize(
+    "classification",
+    create_classification_dataset,
+    {"n_samples": 10000, "n_features": 20, "random_state": 0},
+)
+arrays = open_arrays(dataset)
+X, y = arrays["X"], arrays["y"]
 
 # Train and evaluate
 clf = RandomForestClassifier(**params, random_state=42)
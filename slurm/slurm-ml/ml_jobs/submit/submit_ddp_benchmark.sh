@@ -0,0 +1,19 @@
+#!/bin/bash
+
+#SBATCH --job-name=ddp_bench
+#SBATCH --nodes=2
+#SBATCH --ntasks-per-node=1
+#SBATCH --cpus-per-task=2
+
+
+# Activate virtual environment
+source /opt/venv/bin/activate
+
+# Set up distributed environment variables
+export MASTER_ADDR=$(hostname)
+export MASTER_PORT=29500
+
+# Time compute and communication per optimizer step for every comm hook,
+# bucket size and accumulation setting; the table goes to
+# /shared/results/ddp_benchmark_$SLURM_JOB_ID.txt
+srun python /ml_jobs/scripts/ddp_benchmark.py --pin-cores
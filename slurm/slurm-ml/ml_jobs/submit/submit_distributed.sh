@@ -3,6 +3,12 @@
 #SBATCH --job-name=dist_train
 #SBATCH --nodes=2
 #SBATCH --ntasks-per-node=1
+#SBATCH --cpus-per-task=2
+#SBATCH --requeue
+#SBATCH --open-mode=append
+# Send SIGTERM to the training tasks 2 minutes before the time limit, so
+# they can checkpoint and requeue
+#SBATCH --signal=TERM@120
 
 
 # Activate virtual environment
@@ -12,5 +18,12 @@ source /opt/venv/bin/activate
 export MASTER_ADDR=$(hostname)
 export MASTER_PORT=29500
 
-# Run distributed training using srun
-srun python /ml_jobs/scripts/distributed_train.py
\ No newline at end of file
+# Run distributed training using srun. Each task uses --cpus-per-task
+# threads on its own cores; add --bf16 and/or --compile to compare
+srun python /ml_jobs/scripts/distributed_train.py --pin-cores
+
+# Training exits with 3 after checkpointing on a pre-emption warning; requeue
+# to resume from the checkpoint in /shared/models/distributed_$SLURM_JOB_ID
+if [ $? -eq 3 ]; then
+    scontrol requeue $SLURM_JOB_ID
+fi
\ No newline at end of file
@@ -0,0 +1,513 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+# Keep progress bars out of the timings and the output
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+from docs_to_pdf import DEFAULT_RENDERER, HTML_HEAD, RENDERERS, DocsToPDF  # noqa: E402
+
+STAGES = ["find", "read", "toc", "convert", "render"]
+
+WORDS = (
+    "cluster node deploy service container image volume network pipeline "
+    "config secret ingress pod replica rollout metric alert dashboard index "
+    "query shard backup restore latency throughput queue worker schedule job"
+).split()
+
+LANGUAGES = ["bash", "python", "yaml", "json"]
+
+
+def make_png(width: int, height: int, color: tuple) -> bytes:
+    """Create a solid color RGB PNG without any imaging library."""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+        )
+
+    row = b"\0" + bytes(color) * width
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(row * height))
+        + chunk(b"IEND", b"")
+    )
+
+
+def generate_document(
+    rng: random.Random,
+    title: str,
+    sections: int,
+    tables: int,
+    code_blocks: int,
+    images: list,
+) -> str:
+    """Generate the markdown for one synthetic document."""
+
+    def sentence() -> str:
+        words = rng.choices(WORDS, k=rng.randint(6, 16))
+        return " ".join(words).capitalize() + "."
+
+    def paragraph() -> str:
+        return " ".join(sentence() for _ in range(rng.randint(2, 6)))
+
+    blocks = [f"# {title}", paragraph()]
+    for section in range(sections):
+        blocks.append(f"## {' '.join(rng.choices(WORDS, k=3)).title()} {section}")
+        blocks.append(paragraph())
+        blocks.append("\n".join(f"- {sentence()}" for _ in range(rng.randint(2, 5))))
+
+    for _ in range(tables):
+        columns = rng.randint(2, 5)
+        header = [rng.choice(WORDS) for _ in range(columns)]
+        rows = [
+            "| " + " | ".join(header) + " |",
+            "|" + "---|" * columns,
+        ]
+        for _ in range(rng.randint(3, 10)):
+            rows.append(
+                "| " + " | ".join(str(rng.randint(0, 9999)) for _ in header) + " |"
+            )
+        blocks.insert(rng.randint(2, len(blocks)), "\n".join(rows))
+
+    for _ in range(code_blocks):
+        lines = [
+            f"{rng.choice(WORDS)}_{i} = {rng.randint(0, 100)}"
+            for i in range(rng.randint(3, 15))
+        ]
+        code = "\n".join([f"```{rng.choice(LANGUAGES)}", *lines, "```"])
+        blocks.insert(rng.randint(2, len(blocks)), code)
+
+    for image in images:
+        blocks.insert(rng.randint(2, len(blocks)), f"![{Path(image).stem}]({image})")
+
+    return "\n\n".join(blocks) + "\n"
+
+
+def generate_corpus(
+    path: str,
+    files: int = 200,
+    depth: int = 3,
+    fanout: int = 4,
+    sections: int = 5,
+    tables: int = 1,
+    code_blocks: int = 2,
+    images: int = 0,
+    image_pool: int = 5,
+    seed: int = 0,
+) -> dict:
+    """
+    Generate a synthetic markdown documentation tree.
+
+    Files are spread over a directory tree up to ``depth`` levels deep with
+    ``fanout`` subdirectories per level. Images are drawn from a shared pool,
+    so the same image is referenced from several documents.
+
+    Args:
+        path: Output directory, created if needed
+        files: Number of markdown files
+        depth: Maximum directory depth
+        fanout: Subdirectories per directory
+        sections: Sections (h2 headings) per document
+        tables: Tables per document
+        code_blocks: Fenced code blocks per document
+        images: Image references per document
+        image_pool: Number of distinct images
+        seed: Random seed, the same seed produces the same corpus
+
+    Returns:
+        Dict of the corpus parameters
+    """
+    rng = random.Random(seed)
+    base = Path(path)
+    base.mkdir(parents=True, exist_ok=True)
+
+    pool = []
+    if images:
+        (base / "assets").mkdir(exist_ok=True)
+        for index in range(image_pool):
+            image_path = base / "assets" / f"image_{index}.png"
+            color = tuple(rng.randint(0, 255) for _ in range(3))
+            image_path.write_bytes(make_png(1600, 900, color))
+            pool.append(image_path)
+
+    dirs = [Path()]
+    for level in range(depth):
+        dirs.extend(
+            parent / f"section_{level}_{index}"
+            for parent in list(dirs)
+            if len(parent.parts) == level
+            for index in range(fanout)
+        )
+
+    for index in range(files):
+        rel_dir = rng.choice(dirs)
+        (base / rel_dir).mkdir(parents=True, exist_ok=True)
+        doc_images = [
+            os.path.relpath(image, base / rel_dir)
+            for image in rng.choices(pool, k=images if pool else 0)
+        ]
+        content = generate_document(
+            rng, f"Document {index}", sections, tables, code_blocks, doc_images
+        )
+        (base / rel_dir / f"doc_{index:05d}.md").write_text(content, encoding="utf-8")
+
+    return {
+        "files": files,
+        "depth": depth,
+        "fanout": fanout,
+        "sections": sections,
+        "tables": tables,
+        "code_blocks": code_blocks,
+        "images": images,
+        "image_pool": image_pool,
+        "seed": seed,
+    }
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """
+    Return the peak resident set size in MB so far.
+
+    This is the high-water mark of the whole process since it started, or
+    of the largest terminated child process with RUSAGE_CHILDREN, not the
+    peak of a single stage.
+    """
+    maxrss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return maxrss / (1 << 20) if sys.platform == "darwin" else maxrss / 1024
+
+
+def run_once(
+    corpus: str, work_dir: str, converter: DocsToPDF, render: bool, trace: bool
+) -> dict:
+    """
+    Run every pipeline stage once and measure it.
+
+    Returns:
+        Dict of stage name to a dict with seconds, process_peak_rss_mb (the
+        cumulative peak up to the end of the stage) and, when tracing,
+        python_peak_mb
+    """
+    results = {}
+
+    def measure(stage: str, func):
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        value = func()
+        seconds = time.perf_counter() - start
+        results[stage] = {"seconds": seconds, "process_peak_rss_mb": peak_rss_mb()}
+        if trace:
+            results[stage]["python_peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+        return value
+
+    markdown_files = measure("find", lambda: converter.find_markdown_files(corpus))
+    measure("read", lambda: converter.read_markdown_content(markdown_files))
+    toc_html = measure("toc", lambda: converter.create_toc(markdown_files))
+
+    html_path = os.path.join(work_dir, "output.html")
+    head = HTML_HEAD.format(title="Benchmark", toc=toc_html)
+    measure("convert", lambda: converter.write_html(markdown_files, html_path, head))
+
+    if render:
+        pdf_path = os.path.join(work_dir, "output.pdf")
+        measure("render", lambda: converter.render_pdf(html_path, pdf_path))
+        results["render"]["child_peak_rss_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+        results["render"]["pdf_mb"] = os.path.getsize(pdf_path) / 1e6
+
+    results["files"] = len(markdown_files)
+    results["html_mb"] = os.path.getsize(html_path) / 1e6
+    return results
+
+
+def git_revision() -> Optional[str]:
+    """Return the current git revision of this tool, if available."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    corpus: str,
+    repeat: int = 3,
+    jobs: int = 1,
+    renderer: str = DEFAULT_RENDERER,
+    render: bool = True,
+    trace: bool = False,
+) -> dict:
+    """
+    Benchmark the docs_to_pdf pipeline on a corpus.
+
+    Each stage is run ``repeat`` times; the reported time is the median and
+    all runs are kept in the results. The build cache is disabled so every
+    run does the full work.
+
+    Returns:
+        Machine-readable results, see README
+    """
+    if render and shutil.which("wkhtmltopdf") is None:
+        print("wkhtmltopdf not found, skipping the render stage")
+        render = False
+
+    runs = []
+    for index in range(repeat):
+        converter = DocsToPDF(jobs=jobs, renderer=renderer)
+        try:
+            runs.append(run_once(corpus, converter.temp_dir, converter, render, trace))
+        finally:
+            converter.cleanup()
+        total = sum(runs[-1][stage]["seconds"] for stage in STAGES if stage in runs[-1])
+        print(f"Run {index + 1}/{repeat}: {total:.3f}s")
+
+    stages = {}
+    for stage in STAGES:
+        if stage not in runs[0]:
+            continue
+        seconds = [run[stage]["seconds"] for run in runs]
+        stages[stage] = {
+            "seconds": statistics.median(seconds),
+            "min_seconds": min(seconds),
+            "max_seconds": max(seconds),
+        }
+        for key in (
+            "process_peak_rss_mb",
+            "child_peak_rss_mb",
+            "python_peak_mb",
+            "pdf_mb",
+        ):
+            if key in runs[0][stage]:
+                stages[stage][key] = max(run[stage][key] for run in runs)
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "options": {
+            "jobs": jobs,
+            "renderer": renderer,
+            "repeat": repeat,
+            "render": render,
+            "trace_memory": trace,
+        },
+        "files": runs[0]["files"],
+        "html_mb": runs[0]["html_mb"],
+        "stages": stages,
+        "total_seconds": sum(stage["seconds"] for stage in stages.values()),
+        "runs": runs,
+    }
+
+
+def print_results(results: dict):
+    """Print benchmark results as a table."""
+    print(
+        f"\n{results['files']} files, {results['html_mb']:.1f} MB HTML, "
+        f"revision {results['revision'] or 'unknown'}"
+    )
+    # The process peak is a high-water mark, so each stage includes the peaks
+    # of the stages before it
+    print(f"{'Stage':<10}{'median s':>12}{'min s':>10}{'process peak MB':>18}")
+    for stage, data in results["stages"].items():
+        print(
+            f"{stage:<10}{data['seconds']:>12.3f}{data['min_seconds']:>10.3f}"
+            f"{data['process_peak_rss_mb']:>18.1f}"
+        )
+    print(f"{'total':<10}{results['total_seconds']:>12.3f}")
+    render = results["stages"].get("render", {})
+    if "child_peak_rss_mb" in render:
+        print(f"Largest child process peak: {render['child_peak_rss_mb']:.1f} MB")
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> bool:
+    """
+    Print per-stage differences between two benchmark results.
+
+    Returns:
+        True if any stage got slower by more than ``threshold`` percent
+    """
+    print(
+        f"Baseline {baseline['revision'] or 'unknown'} "
+        f"({baseline['files']} files) vs current {current['revision'] or 'unknown'} "
+        f"({current['files']} files)"
+    )
+    if baseline["files"] != current["files"]:
+        print("Warning: results were measured on different corpora")
+    for section in ("options", "corpus"):
+        before, after = baseline.get(section, {}), current.get(section, {})
+        for key in sorted(set(before) | set(after)):
+            if before.get(key) != after.get(key):
+                print(
+                    f"Warning: results were measured with different {key}: "
+                    f"{before.get(key)} vs {after.get(key)}"
+                )
+
+    print(f"{'Stage':<10}{'baseline s':>12}{'current s':>12}{'change':>10}")
+    regressed = False
+    rows = [
+        (stage, baseline["stages"][stage]["seconds"], data["seconds"])
+        for stage, data in current["stages"].items()
+        if stage in baseline["stages"]
+    ]
+    rows.append(("total", baseline["total_seconds"], current["total_seconds"]))
+    for stage, before, after in rows:
+        change = (after - before) / before * 100 if before else 0.0
+        marker = ""
+        if change > threshold and stage != "total":
+            marker = "  REGRESSION"
+            regressed = True
+        print(f"{stage:<10}{before:>12.3f}{after:>12.3f}{change:>+9.1f}%{marker}")
+
+    return regressed
+
+
+def add_corpus_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--files", type=int, default=200, help="Markdown files")
+    parser.add_argument("--depth", type=int, default=3, help="Directory depth")
+    parser.add_argument("--fanout", type=int, default=4, help="Subdirs per dir")
+    parser.add_argument("--sections", type=int, default=5, help="Sections per file")
+    parser.add_argument("--tables", type=int, default=1, help="Tables per file")
+    parser.add_argument(
+        "--code-blocks", type=int, default=2, help="Code blocks per file"
+    )
+    parser.add_argument("--images", type=int, default=0, help="Images per file")
+    parser.add_argument(
+        "--image-pool", type=int, default=5, help="Distinct images in the corpus"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+
+
+def corpus_kwargs(args: argparse.Namespace) -> dict:
+    return {
+        "files": args.files,
+        "depth": args.depth,
+        "fanout": args.fanout,
+        "sections": args.sections,
+        "tables": args.tables,
+        "code_blocks": args.code_blocks,
+        "images": args.images,
+        "image_pool": args.image_pool,
+        "seed": args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark docs_to_pdf.py on a real or synthetic markdown corpus."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate", help="Generate a synthetic corpus")
+    generate.add_argument("path", help="Output directory")
+    add_corpus_arguments(generate)
+
+    run = subparsers.add_parser("run", help="Time each stage of the pipeline")
+    run.add_argument(
+        "--corpus",
+        help="Existing markdown directory (default: generate a synthetic corpus)",
+    )
+    add_corpus_arguments(run)
+    run.add_argument("--repeat", type=int, default=3, help="Runs per stage")
+    run.add_argument("--jobs", "-j", type=int, default=1, help="Conversion workers")
+    run.add_argument(
+        "--renderer",
+        choices=list(RENDERERS),
+        default=DEFAULT_RENDERER,
+        help="Markdown rendering backend",
+    )
+    run.add_argument(
+        "--no-render", action="store_true", help="Skip the wkhtmltopdf stage"
+    )
+    run.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Record peak Python allocations per stage with tracemalloc (slower)",
+    )
+    run.add_argument("--output", "-o", help="Write results as JSON to this file")
+
+    compare = subparsers.add_parser("compare", help="Compare two result files")
+    compare.add_argument("baseline", help="Results of the baseline revision")
+    compare.add_argument("current", help="Results of the current revision")
+    compare.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="Slowdown in percent that counts as a regression (default: 10)",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate_corpus(args.path, **corpus_kwargs(args))
+        print(f"Generated {args.files} files in {args.path}")
+
+    elif args.command == "run":
+        corpus_dir = None
+        try:
+            corpus = args.corpus
+            corpus_params = None
+            if corpus is None:
+                corpus_dir = tempfile.mkdtemp()
+                corpus_params = generate_corpus(corpus_dir, **corpus_kwargs(args))
+                corpus = corpus_dir
+
+            results = run_benchmark(
+                corpus,
+                repeat=args.repeat,
+                jobs=args.jobs,
+                renderer=args.renderer,
+                render=not args.no_render,
+                trace=args.trace_memory,
+            )
+            results["corpus"] = corpus_params or {"path": os.path.abspath(corpus)}
+        finally:
+            if corpus_dir:
+                shutil.rmtree(corpus_dir, ignore_errors=True)
+
+        print_results(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"Results written to {args.output}")
+
+    elif args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        if compare_results(baseline, current, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,188 +1,53 @@
 #!/usr/bin/env python
 
 import argparse
+import cProfile
+import ctypes
+import ctypes.util
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing
 import os
+import re
+import select
 import shutil
+import struct
 import subprocess
 import sys
 import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from html import escape, unescape
+from html.parser import HTMLParser
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import unquote, urlsplit
 
 import markdown
 import pdfkit
+from markdown.extensions.toc import slugify, unique
 from tqdm import tqdm
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
-class DocsToPDF:
-    def __init__(self):
-        """Initialize the converter with a temporary working directory."""
-        self.temp_dir = tempfile.mkdtemp()
-        self.repo_dir = None  # For storing cloned repository path
-
-    def cleanup(self):
-        """Clean up temporary directories."""
-        if self.temp_dir and os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir, ignore_errors=True)
-        if self.repo_dir and os.path.exists(self.repo_dir):
-            shutil.rmtree(self.repo_dir, ignore_errors=True)
-
-    @staticmethod
-    def parse_github_url(url: str) -> Tuple[str, str, str, str]:
-        """
-        Parse GitHub URL to extract owner, repo, branch and path.
-
-        Args:
-            url: GitHub URL
-
-        Returns:
-            Tuple of (owner, repo, branch, path)
-        """
-        # Remove 'https://github.com/' from the start
-        path = url.replace("https://github.com/", "")
-
-        # Split the remaining path
-        parts = path.split("/")
-
-        owner = parts[0]
-        repo = parts[1]
-
-        # Find where the branch definition starts
-        if "tree" in parts:
-            tree_index = parts.index("tree")
-            branch = parts[tree_index + 1]
-            # Path is everything after the branch
-            docs_path = "/".join(parts[tree_index + 2 :])
-        else:
-            # If no branch is specified, assume 'main' or 'master'
-            branch = "main"
-            docs_path = "/".join(parts[3:]) if len(parts) > 3 else ""
-
-        return owner, repo, branch, docs_path
-
-    def clone_repository(self, github_url: str) -> Tuple[str, str]:
-        """
-        Clone a GitHub repository to a temporary directory.
-
-        Args:
-            github_url: GitHub repository URL
-
-        Returns:
-            Tuple of (repository_path, docs_path)
-        """
-        try:
-            owner, repo, branch, docs_path = self.parse_github_url(github_url)
-
-            # Create temporary directory for the repository
-            self.repo_dir = tempfile.mkdtemp()
-
-            # Clone the repository
-            print(f"Cloning repository {owner}/{repo}...")
-            clone_url = f"https://github.com/{owner}/{repo}.git"
-            subprocess.run(
-                [
-                    "git",
-                    "clone",
-                    "-b",
-                    branch,
-                    "--depth",
-                    "1",
-                    clone_url,
-                    self.repo_dir,
-                ],
-                check=True,
-                capture_output=True,
-                text=True,
-            )
-
-            # Construct full docs path
-            full_docs_path = os.path.join(self.repo_dir, docs_path)
-
-            if not os.path.exists(full_docs_path):
-                raise Exception(f"Documentation path not found: {docs_path}")
-
-            return full_docs_path
-
-        except subprocess.CalledProcessError as e:
-            raise Exception(f"Failed to clone repository: {e.stderr}") from e
-        except Exception as e:
-            raise Exception(f"Error cloning repository: {str(e)}") from e
-
-    def find_markdown_files(self, base_path: str) -> list:
-        """
-        Recursively find all markdown files in the given directory.
-        Returns sorted list to maintain consistent ordering.
-        """
-        markdown_files = []
-        base_path = Path(base_path)
-
-        for file_path in sorted(base_path.rglob("*")):
-            if file_path.suffix.lower() in [".md", ".markdown"]:
-                rel_path = file_path.relative_to(base_path)
-                markdown_files.append(
-                    {
-                        "path": str(file_path),
-                        "rel_path": str(rel_path),
-                        "name": file_path.name,
-                        "anchor": f"doc_{len(markdown_files)}",
-                    }
-                )
-
-        return markdown_files
-
-    def read_markdown_content(self, markdown_files: list):
-        """Read content from all markdown files."""
-        for md_file in tqdm(
-            markdown_files, total=len(markdown_files), desc="Reading files"
-        ):
-            try:
-                with open(md_file["path"], "r", encoding="utf-8") as f:
-                    md_file["content"] = f.read()
-            except Exception as e:
-                print(f"Error reading {md_file['path']}: {str(e)}")
-                md_file["content"] = f"Error reading file: {str(e)}"
+MARKDOWN_EXTENSIONS = [
+    "markdown.extensions.fenced_code",
+    "markdown.extensions.tables",
+    "markdown.extensions.toc",
+]
 
-    def create_toc(self, markdown_files: list) -> str:
-        """Create a table of contents in HTML with proper hierarchy."""
-        toc = ["<h1>Table of Contents</h1>", '<ul class="toc">']
-
-        current_dirs = []
-        for md_file in tqdm(
-            markdown_files, total=len(markdown_files), desc="Creating TOC"
-        ):
-            rel_path = Path(md_file["rel_path"])
-            dirs = list(rel_path.parent.parts)
-
-            while len(current_dirs) > 0 and (
-                len(dirs) == 0 or current_dirs[0] != dirs[0]
-            ):
-                toc.append("</ul></li>")
-                current_dirs.pop(0)
-
-            while len(dirs) > 0 and (
-                len(current_dirs) == 0 or current_dirs[0] != dirs[0]
-            ):
-                dir_name = dirs.pop(0)
-                current_dirs.insert(0, dir_name)
-                toc.append(f'<li class="dir">{dir_name}<ul>')
-
-            file_name = rel_path.stem
-            toc.append(
-                f'<li class="file"><a href="#{md_file["anchor"]}">{file_name}</a></li>'
-            )
-
-        for _ in current_dirs:
-            toc.append("</ul></li>")
-
-        toc.append("</ul>")
-        return "\n".join(toc)
-
-    def convert_to_pdf(
-        self, markdown_files: list, output_path: str, title: str = "Documentation"
-    ):
-        """Convert markdown files to a single PDF using pdfkit."""
-        # HTML template
-        html_template = """
+# HTML template, split at {content} so documents can be streamed in between
+HTML_TEMPLATE = """
         <!DOCTYPE html>
         <html>
         <head>
@@ -211,6 +76,10 @@ class DocsToPDF:
                 .toc .file {{
                     margin-left: 10px;
                 }}
+                .toc .headings {{
+                    font-weight: normal;
+                    font-size: 0.9em;
+                }}
                 .toc a {{
                     color: #0366d6;
                     text-decoration: none;
@@ -281,133 +150,2435 @@ class DocsToPDF:
         </body>
         </html>
         """
+HTML_HEAD, HTML_TAIL = HTML_TEMPLATE.split("{content}")
+# Document head without the title heading and TOC, used for rendering shards
+HTML_PREAMBLE = HTML_HEAD[: HTML_HEAD.index("<h1>{title}</h1>")]
 
-        # Read content from all files
-        self.read_markdown_content(markdown_files)
+# PDF options passed to wkhtmltopdf
+PDF_OPTIONS = {
+    "page-size": "Letter",
+    "margin-top": "20mm",
+    "margin-right": "20mm",
+    "margin-bottom": "20mm",
+    "margin-left": "20mm",
+    "encoding": "UTF-8",
+    "no-outline": None,
+    "enable-local-file-access": None,
+}
 
-        # Create table of contents
-        toc_html = self.create_toc(markdown_files)
+# Width of the printable area in inches (Letter minus 20mm margins), used to
+# size images for a target DPI
+PRINTABLE_WIDTH_INCHES = 8.5 - 2 * 20 / 25.4
 
-        # Convert markdown files to HTML
-        html_contents = []
-        for md_file in tqdm(
-            markdown_files, total=len(markdown_files), desc="Converting to HTML"
-        ):
-            html = markdown.markdown(
-                md_file["content"],
-                extensions=[
-                    "markdown.extensions.fenced_code",
-                    "markdown.extensions.tables",
-                    "markdown.extensions.toc",
-                ],
-            )
-            html_contents.append(
-                f'<div id="{md_file["anchor"]}" class="document">'
-                f'<h2>{Path(md_file["rel_path"]).stem}</h2>'
-                f'<div class="file-path">{md_file["rel_path"]}</div>'
-                f'{html}</div>'
-            )
+IMG_SRC_RE = re.compile(r'(<img\b[^>]*?\bsrc=)(["\'])(.*?)\2', re.IGNORECASE)
 
-        # Combine everything into a single HTML document
-        html_content = html_template.format(
-            title=title, toc=toc_html, content="\n".join(html_contents)
-        )
+# Invisible but rendered, so wkhtmltopdf emits link annotations for it
+HIDDEN_STYLE = "font-size:1px;line-height:1px;color:#fff;text-decoration:none"
 
-        # Save HTML to temporary file
-        temp_html = os.path.join(self.temp_dir, "output.html")
-        with open(temp_html, "w", encoding="utf-8") as f:
-            f.write(html_content)
-
-        # PDF options
-        options = {
-            "page-size": "Letter",
-            "margin-top": "20mm",
-            "margin-right": "20mm",
-            "margin-bottom": "20mm",
-            "margin-left": "20mm",
-            "encoding": "UTF-8",
-            "no-outline": None,
-            "enable-local-file-access": None,
-        }
+# Anchor after the content of a shard, targeted by the links around its nav list
+SHARD_END = "shard-end"
 
+# Element ids and local links, prefixed per document for unique anchors
+ANCHOR_RE = re.compile(r'(\sid="|\shref="#)([^"]+)"')
+
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+
+# Directories that never contain documentation and are skipped while walking
+PRUNED_DIRS = {
+    ".git",
+    ".hg",
+    ".svn",
+    "node_modules",
+    "__pycache__",
+    ".venv",
+    "venv",
+    ".tox",
+    ".mypy_cache",
+    ".pytest_cache",
+}
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "docs-to-pdf"
+)
+DEFAULT_CACHE_SIZE_MB = 512
+
+
+class BuildCache:
+    """
+    Content-addressed on-disk cache for rendered HTML fragments and PDFs.
+
+    Entries are stored under ``<cache_dir>/<kind>/<key[:2]>/<key>`` and written
+    atomically, so the cache can be shared by worker processes. When the cache
+    grows beyond ``max_size`` bytes, the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = DEFAULT_CACHE_SIZE_MB << 20):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        """Return a stable hash over the given string parts."""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _entry_path(self, kind: str, key: str) -> Path:
+        return self.cache_dir / kind / key[:2] / key
+
+    def _lookup(self, kind: str, key: str) -> Optional[Path]:
+        path = self._entry_path(kind, key)
         try:
-            print("Converting HTML to PDF...")
-            pdfkit.from_file(temp_html, output_path, options=options)
+            # Refresh mtime so eviction is least-recently-used
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def _store(self, kind: str, key: str, data: bytes):
+        path = self._entry_path(kind, key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
         except OSError as e:
-            if "wkhtmltopdf" in str(e):
-                raise Exception(
-                    "wkhtmltopdf is not installed. Please install it first:\n"
-                    "- On Mac: brew install wkhtmltopdf\n"
-                    "- On Linux: sudo apt-get install wkhtmltopdf\n"
-                    "- Or download from: https://wkhtmltopdf.org/downloads.html"
-                ) from e
-            raise
+            print(f"Warning: could not write cache entry {path}: {str(e)}")
+
+    def get_fragment(self, key: str) -> Optional[Tuple[str, list]]:
+        """Return a cached HTML fragment and its headings, or None on a miss."""
+        path = self._lookup("fragments", key)
+        if path is None:
+            return None
+        try:
+            html, headings = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None  # Unreadable or written by an older version
+        return html, [tuple(heading) for heading in headings]
 
-    def convert(self, source: str, output_path: str, title: Optional[str] = None):
+    def put_fragment(self, key: str, html: str, headings: list):
+        """Store a rendered HTML fragment with its headings."""
+        self._store("fragments", key, json.dumps([html, headings]).encode("utf-8"))
+
+    def get_pdf(self, key: str) -> Optional[Path]:
+        """Return the path of a cached PDF, or None on a miss."""
+        return self._lookup("pdf", key)
+
+    def put_pdf(self, key: str, pdf_path: str):
+        """Store a rendered PDF."""
+        with open(pdf_path, "rb") as f:
+            self._store("pdf", key, f.read())
+
+    def get_asset(self, key: str) -> Optional[Path]:
+        """Return the path of a cached processed image, or None on a miss."""
+        return self._lookup("assets", key)
+
+    def put_asset(self, key: str, data: bytes) -> Path:
+        """Store a processed image and return its path."""
+        self._store("assets", key, data)
+        return self._entry_path("assets", key)
+
+    def prune(self):
         """
-        Convert documentation to PDF from either GitHub URL or local path.
+        Evict least recently used entries until the cache fits in max_size.
 
-        Args:
-            source: GitHub URL or local path
-            output_path: Output PDF file path
-            title: Optional title for the documentation
+        Only rendered fragments, PDFs and images are evicted; repository mirrors kept
+        in the same directory are left alone.
         """
-        try:
-            # Determine if source is a GitHub URL or local path
-            if source.startswith("https://github.com"):
-                input_path = self.clone_repository(source)
-                if title is None:
-                    # Extract repo name from URL for title
-                    owner, repo, _, _ = self.parse_github_url(source)
-                    title = f"{repo} Documentation"
-            else:
-                input_path = os.path.abspath(source)
-                if title is None:
-                    title = (
-                        os.path.basename(input_path.rstrip("/\\")) + " Documentation"
-                    )
+        entries = []
+        total = 0
+        for root, _, files in itertools.chain.from_iterable(
+            os.walk(self.cache_dir / kind) for kind in ("fragments", "pdf", "assets")
+        ):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
 
-            print(f"Processing documentation in: {input_path}")
+        if total <= self.max_size:
+            return
 
-            if not os.path.exists(input_path):
-                raise Exception(f"Input path does not exist: {input_path}")
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
 
-            # Find all markdown files
-            print("Finding markdown files...")
-            markdown_files = self.find_markdown_files(input_path)
 
-            if not markdown_files:
-                raise Exception("No markdown files found in the specified path")
+def read_file(path: str) -> str:
+    """Read a markdown file, returning an error message instead of raising."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception as e:
+        print(f"Error reading {path}: {str(e)}")
+        return f"Error reading file: {str(e)}"
 
-            # Convert to PDF
-            print(f"Converting {len(markdown_files)} files to PDF...")
-            self.convert_to_pdf(markdown_files, output_path, title)
 
-            print(f"PDF successfully created at: {output_path}")
+def compile_glob(pattern: str) -> "re.Pattern":
+    """
+    Compile a gitignore-style glob into a regex matching relative paths.
 
-        except Exception as e:
-            print(f"Error: {str(e)}")
-            raise
-        finally:
-            self.cleanup()
+    ``*`` and ``?`` do not match ``/``, ``**`` matches across directories, and
+    patterns without a slash (other than a trailing one) match at any depth.
+    """
+    anchored = "/" in pattern.rstrip("/")
+    pattern = pattern.strip("/")
 
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2 :]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1 : end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            regex += f"[{body.replace(chr(92), chr(92) * 2)}]"
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Convert markdown documentation to PDF from GitHub repository or local folder."
-    )
-    parser.add_argument(
-        "source",
-        help="GitHub repository URL (https://github.com/user/repo/tree/branch/docs) or local folder path",
-    )
-    parser.add_argument("output", help="Output PDF file path")
-    parser.add_argument("--title", help="Custom title for the documentation (optional)")
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return re.compile(regex + "$")
 
-    args = parser.parse_args()
 
+def load_gitignore(directory: str) -> list:
+    """
+    Load the rules of a .gitignore file in the given directory.
+
+    Returns:
+        List of (directory, regex, negated, dir_only) tuples
+    """
+    rules = []
     try:
-        converter = DocsToPDF()
-        converter.convert(args.source, args.output, args.title)
+        with open(os.path.join(directory, ".gitignore"), encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        if line.startswith("\\"):
+            line = line[1:]
+        rules.append((directory, compile_glob(line), negated, line.endswith("/")))
+
+    return rules
+
+
+def is_ignored(rules: list, path: str, is_dir: bool) -> bool:
+    """Check a path against gitignore rules; the last matching rule wins."""
+    ignored = False
+    for directory, regex, negated, dir_only in rules:
+        if dir_only and not is_dir:
+            continue
+        if not path.startswith(directory + os.sep):
+            continue
+        rel_path = path[len(directory) + 1 :].replace(os.sep, "/")
+        if regex.match(rel_path):
+            ignored = not negated
+    return ignored
+
+
+class MarkdownRenderer(ABC):
+    """Base class for markdown rendering backends."""
+
+    name = None
+
+    def __init__(self):
+        self.version = ""
+
+    @property
+    def cache_key(self) -> str:
+        """Identifies the backend and its configuration in cache keys."""
+        return f"{self.name}:{self.version}:{','.join(MARKDOWN_EXTENSIONS)}"
+
+    @abstractmethod
+    def render(self, text: str) -> str:
+        """Render markdown to HTML."""
+
+    @abstractmethod
+    def render_with_headings(self, text: str) -> Tuple[str, list]:
+        """
+        Render markdown and collect its headings in the same pass.
+
+        Returns:
+            Tuple of (html, headings), where headings is a list of
+            (level, id, name) tuples in document order and name is the
+            HTML-escaped heading text
+        """
+
+
+class PythonMarkdownRenderer(MarkdownRenderer):
+    """
+    Python-Markdown with a single reusable parser instance.
+
+    The instance is reset between documents instead of being rebuilt, so the
+    extensions are only loaded once. Output is identical to
+    ``markdown.markdown``.
+    """
+
+    name = "markdown"
+
+    def __init__(self):
+        self.md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+        self.version = markdown.__version__
+
+    def render(self, text: str) -> str:
+        self.md.reset()
+        return self.md.convert(text)
+
+    def render_with_headings(self, text: str) -> Tuple[str, list]:
+        html = self.render(text)
+
+        # The toc extension leaves the headings as a tree in toc_tokens
+        headings = []
+        stack = [iter(self.md.toc_tokens)]
+        while stack:
+            token = next(stack[-1], None)
+            if token is None:
+                stack.pop()
+                continue
+            headings.append((token["level"], token["id"], token["name"]))
+            stack.append(iter(token["children"]))
+        return html, headings
+
+
+class MarkdownItRenderer(MarkdownRenderer):
+    """markdown-it-py with tables, and heading ids if mdit-py-plugins is installed."""
+
+    name = "markdown-it"
+
+    def __init__(self):
+        try:
+            import markdown_it
+        except ImportError as e:
+            raise Exception(
+                "markdown-it-py is required for the markdown-it renderer. "
+                "Install it with:\npip install markdown-it-py mdit-py-plugins"
+            ) from e
+
+        self.md = markdown_it.MarkdownIt("commonmark").enable("table")
+        self.version = markdown_it.__version__
+        try:
+            from mdit_py_plugins.anchors import anchors_plugin
+        except ImportError:
+            pass
+        else:
+            self.md.use(
+                anchors_plugin, max_level=6, slug_func=lambda s: slugify(s, "-")
+            )
+
+    def render(self, text: str) -> str:
+        return self.md.render(text)
+
+    def render_with_headings(self, text: str) -> Tuple[str, list]:
+        env = {}
+        tokens = self.md.parse(text, env)
+        html = self.md.renderer.render(tokens, self.md.options, env)
+
+        headings = []
+        for token, inline in zip(tokens, tokens[1:]):
+            if token.type != "heading_open" or not token.attrGet("id"):
+                continue
+            name = "".join(
+                child.content
+                for child in inline.children or []
+                if child.type in ("text", "code_inline")
+            )
+            headings.append((int(token.tag[1]), token.attrGet("id"), escape(name)))
+        return html, headings
+
+
+class MistuneRenderer(MarkdownRenderer):
+    """mistune 3 with tables and heading ids."""
+
+    name = "mistune"
+
+    def __init__(self):
+        try:
+            import mistune
+            from mistune.toc import add_toc_hook
+        except ImportError as e:
+            raise Exception(
+                "mistune 3 is required for the mistune renderer. Install it with:\n"
+                "pip install mistune"
+            ) from e
+
+        self.md = mistune.create_markdown(escape=False, plugins=["table"])
+        self.version = mistune.__version__
+        add_toc_hook(self.md, max_level=6, heading_id=self.heading_id)
+        self.ids = set()
+
+    def heading_id(self, token: dict, index: int) -> str:
+        """Slugify a heading like the toc extension, suffixing repeated ids."""
+        if index == 0:  # First heading of a new document
+            self.ids.clear()
+        return unique(slugify(token["text"], "-"), self.ids)
+
+    def render(self, text: str) -> str:
+        return self.md(text)
+
+    def render_with_headings(self, text: str) -> Tuple[str, list]:
+        html, state = self.md.parse(text)
+        return html, [tuple(item) for item in state.env.get("toc_items", [])]
+
+
+RENDERERS = {
+    renderer.name: renderer
+    for renderer in (PythonMarkdownRenderer, MarkdownItRenderer, MistuneRenderer)
+}
+DEFAULT_RENDERER = PythonMarkdownRenderer.name
+
+# Parsers keep state while converting, so each thread gets its own instances
+_renderer_instances = threading.local()
+
+
+def get_renderer(name: str = DEFAULT_RENDERER) -> MarkdownRenderer:
+    """Return the renderer instance for the given backend, one per thread."""
+    instances = _renderer_instances.__dict__
+    if name not in instances:
+        if name not in RENDERERS:
+            raise Exception(
+                f"Unknown renderer: {name} (available: {', '.join(RENDERERS)})"
+            )
+        instances[name] = RENDERERS[name]()
+    return instances[name]
+
+
+def normalize_html(html: str) -> list:
+    """
+    Reduce HTML to a token list for comparing renderer output.
+
+    Whitespace between and inside text is collapsed except in ``<pre>``,
+    attributes are sorted, and ``id`` attributes are dropped because
+    backends generate heading ids differently.
+    """
+
+    class Normalizer(HTMLParser):
+        def __init__(self):
+            super().__init__()
+            self.tokens = []
+            self.pre = 0
+
+        def handle_starttag(self, tag, attrs):
+            self.pre += tag == "pre"
+            attrs = sorted((k, v or "") for k, v in attrs if k != "id")
+            self.tokens.append(("start", tag, tuple(attrs)))
+
+        def handle_startendtag(self, tag, attrs):
+            self.handle_starttag(tag, attrs)
+            self.handle_endtag(tag)
+
+        def handle_endtag(self, tag):
+            self.pre -= tag == "pre"
+            self.tokens.append(("end", tag))
+
+        def handle_data(self, data):
+            if not self.pre:
+                data = " ".join(data.split())
+            if data:
+                if self.tokens and self.tokens[-1][0] == "data":
+                    data = self.tokens.pop()[1] + data
+                self.tokens.append(("data", data))
+
+    parser = Normalizer()
+    parser.feed(html)
+    parser.close()
+    return parser.tokens
+
+
+def render_batch(
+    batch: list,
+    cache: Optional[BuildCache] = None,
+    renderer: str = DEFAULT_RENDERER,
+) -> list:
+    """Render a batch of documents in a worker process."""
+    return [render_timed(md_file, cache, renderer) for md_file in batch]
+
+
+def render_timed(
+    md_file: dict,
+    cache: Optional[BuildCache] = None,
+    renderer: str = DEFAULT_RENDERER,
+) -> Tuple[str, list, float]:
+    """
+    Convert a single markdown file to HTML and time the conversion.
+
+    Returns:
+        Tuple of (html, headings, seconds), where seconds includes reading
+        the file
+    """
+    start = time.perf_counter()
+    html, headings = render_markdown(md_file, cache, renderer)
+    return html, headings, time.perf_counter() - start
+
+
+def render_markdown(
+    md_file: dict,
+    cache: Optional[BuildCache] = None,
+    renderer: str = DEFAULT_RENDERER,
+) -> Tuple[str, list]:
+    """
+    Convert a single markdown file to HTML.
+
+    Defined at module level so it can be shipped to worker processes.
+    The file is read here when its content has not been loaded yet. When a
+    cache is given, the rendered markdown is looked up by content hash first.
+
+    Returns:
+        Tuple of (html, headings), see MarkdownRenderer.render_with_headings
+    """
+    content = md_file.get("content")
+    if content is None:
+        content = read_file(md_file["path"])
+
+    backend = get_renderer(renderer)
+
+    result = None
+    if cache is not None:
+        key = BuildCache.key(backend.cache_key, content)
+        result = cache.get_fragment(key)
+
+    if result is None:
+        result = backend.render_with_headings(content)
+        if cache is not None:
+            cache.put_fragment(key, *result)
+
+    return result
+
+
+def prefix_anchors(html: str, prefix: str) -> str:
+    """
+    Prefix the element ids and local links of a document.
+
+    Heading ids such as "installation" repeat across documents, so they are
+    made unique in the combined HTML by prefixing them with the document
+    anchor. Links within the document are rewritten to match.
+    """
+    return ANCHOR_RE.sub(lambda m: f'{m.group(1)}{prefix}-{m.group(2)}"', html)
+
+
+def toc_headings(headings: list) -> str:
+    """
+    Build nested lists of links from (level, anchor, name) headings.
+
+    Skipped levels, such as an h3 directly below an h1, are nested one level
+    deep. Runs in linear time in the number of headings.
+    """
+    parts = []
+    levels = []  # Heading level of each open list
+    for level, anchor, name in headings:
+        if levels and level <= levels[-1]:
+            parts.append("</li>")
+            while len(levels) > 1 and levels[-1] > level and levels[-2] >= level:
+                levels.pop()
+                parts.append("</ul></li>")
+            levels[-1] = level
+        else:
+            parts.append('<ul class="headings">')
+            levels.append(level)
+        parts.append(f'<li><a href="#{anchor}">{name}</a>')
+
+    parts.extend("</li></ul>" for _ in levels)
+    return "".join(parts)
+
+
+def document_section(md_file: dict, html: str) -> str:
+    """Wrap the HTML of a markdown file into its anchored document section."""
+    return (
+        f'<div id="{md_file["anchor"]}" class="document">'
+        f'<h2>{Path(md_file["rel_path"]).stem}</h2>'
+        f'<div class="file-path">{md_file["rel_path"]}</div>'
+        f"{html}</div>"
+    )
+
+
+def load_pillow():
+    """Import Pillow, which is only needed for image downscaling."""
+    try:
+        from PIL import Image
+    except ImportError as e:
+        raise Exception(
+            "Pillow is required for image downscaling. Install it with:\n"
+            "pip install Pillow"
+        ) from e
+    return Image
+
+
+def process_image(data: bytes, max_width: Optional[int], quality: int) -> bytes:
+    """
+    Downscale an image to max_width pixels and recompress it.
+
+    JPEG images are re-encoded with the given quality and PNG images are
+    optimized. Formats Pillow cannot read, such as SVG, are returned
+    unchanged, as is any result that would be larger than the original.
+    """
+    Image = load_pillow()
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image_format = image.format
+            if image_format not in ("JPEG", "PNG"):
+                return data
+
+            resized = max_width is not None and image.width > max_width
+            if resized:
+                image = image.copy()
+                image.thumbnail((max_width, image.height), Image.LANCZOS)
+
+            output = io.BytesIO()
+            if image_format == "JPEG":
+                image.save(output, "JPEG", quality=quality, optimize=True)
+            else:
+                image.save(output, "PNG", optimize=True)
+    except OSError:
+        return data
+
+    processed = output.getvalue()
+    return processed if resized or len(processed) < len(data) else data
+
+
+def load_pypdf():
+    """Import pypdf, which is only needed for sharded rendering."""
+    try:
+        import pypdf
+    except ImportError as e:
+        raise Exception(
+            "pypdf is required for sharded rendering. Install it with:\n"
+            "pip install pypdf"
+        ) from e
+    return pypdf
+
+
+def find_internal_links(reader) -> list:
+    """
+    Find internal link annotations in a PDF, in page order.
+
+    Returns:
+        List of dicts with the link's page index, annotation object, rect and
+        target as (page_index, top), where target is None if it cannot be
+        resolved
+    """
+    from pypdf.generic import ArrayObject
+
+    page_numbers = {
+        page.indirect_reference.idnum: index for index, page in enumerate(reader.pages)
+    }
+    named_destinations = reader.named_destinations
+
+    links = []
+    for page_index, page in enumerate(reader.pages):
+        for annot in page.get("/Annots") or []:
+            annot = annot.get_object()
+            if annot.get("/Subtype") != "/Link":
+                continue
+
+            dest = annot.get("/Dest")
+            if dest is None:
+                action = annot.get("/A")
+                if action is None or action.get("/S") != "/GoTo":
+                    continue  # External link
+                dest = action.get("/D")
+            dest = dest.get_object() if dest is not None else None
+
+            target = None
+            if isinstance(dest, ArrayObject) and dest:
+                top = dest[3] if dest[1] == "/XYZ" and len(dest) > 3 else None
+                target = (page_numbers.get(dest[0].idnum), top)
+            elif dest is not None:
+                name = str(dest)
+                named = named_destinations.get(name) or named_destinations.get(
+                    name.lstrip("/")
+                )
+                if named is not None:
+                    target = (reader.get_destination_page_number(named), named.top)
+
+            links.append(
+                {
+                    "page": page_index,
+                    "annot": annot,
+                    "rect": annot["/Rect"],
+                    "target": target,
+                }
+            )
+
+    return links
+
+
+def find_nav_links(reader, count: int) -> Optional[list]:
+    """
+    Find the hidden links at the start of a rendered shard.
+
+    They are count links to the shard's anchors between two links to its
+    end, which both resolve to the same target.
+
+    Returns:
+        The count + 2 links, or None if a link is missing or unresolved
+    """
+    links = find_internal_links(reader)[: count + 2]
+    if len(links) < count + 2:
+        return None
+    end = links[0]["target"]
+    if end is None or links[-1]["target"] != end:
+        return None
+    return links
+
+
+class DirectoryWatcher:
+    """
+    Wait for changes below a directory.
+
+    Uses inotify on Linux and falls back to polling elsewhere, or when
+    inotify watches cannot be set up. The watcher only signals that something
+    may have changed; callers compare file stats to find out what.
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = (
+        IN_MODIFY
+        | IN_ATTRIB
+        | IN_CLOSE_WRITE
+        | IN_MOVED_FROM
+        | IN_MOVED_TO
+        | IN_CREATE
+        | IN_DELETE
+    )
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, path: str, poll_interval: float = 1.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.fd = None
+        self.watches = {}
+
+        if sys.platform.startswith("linux"):
+            try:
+                self._init_inotify()
+            except OSError as e:
+                print(f"inotify unavailable ({str(e)}), falling back to polling")
+                self.close()
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self.fd is not None else "polling"
+
+    def _init_inotify(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc = libc
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        self.fd = fd
+        self._add_tree(self.path)
+
+    def _add_tree(self, path: str):
+        for root, dirs, _ in os.walk(path):
+            dirs[:] = [d for d in dirs if d not in PRUNED_DIRS]
+            wd = self._libc.inotify_add_watch(
+                self.fd, os.fsencode(root), self.WATCH_MASK
+            )
+            if wd < 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno, f"{os.strerror(errno)}: {root}")
+            self.watches[wd] = root
+
+    def add_files(self, paths):
+        """Also watch files outside the tree, through their directories."""
+        if self.fd is None:
+            return
+        watched = set(self.watches.values())
+        for directory in {os.path.dirname(path) for path in paths} - watched:
+            wd = self._libc.inotify_add_watch(
+                self.fd, os.fsencode(directory), self.WATCH_MASK
+            )
+            if wd >= 0:
+                self.watches[wd] = directory
+                watched.add(directory)
+
+    def _read_events(self) -> bool:
+        """Drain pending inotify events, watching new directories."""
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return False
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                parent = self.watches.get(wd)
+                if parent is not None and os.fsdecode(name) not in PRUNED_DIRS:
+                    try:
+                        self._add_tree(os.path.join(parent, os.fsdecode(name)))
+                    except OSError as e:
+                        print(f"Warning: could not watch new directory: {str(e)}")
+        return True
+
+    def wait(self, debounce: float = 0.2):
+        """
+        Block until a change happens and no further changes follow for
+        ``debounce`` seconds. In polling mode, sleep for the poll interval.
+        """
+        if self.fd is None:
+            time.sleep(self.poll_interval)
+            return
+
+        while not (select.select([self.fd], [], [])[0] and self._read_events()):
+            pass
+        while select.select([self.fd], [], [], debounce)[0]:
+            self._read_events()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class ConversionHooks:
+    """
+    Instrumentation hooks called during a conversion.
+
+    Subclass and override the methods of interest; the default ones do
+    nothing. Stage hooks may be called from several threads at once when
+    shards are rendered in parallel.
+    """
+
+    def stage_started(self, name: str):
+        """Called when a stage (clone, find, toc, html, render or merge) starts."""
+
+    def stage_finished(self, name: str, seconds: float):
+        """Called when a stage finishes, with its wall-clock duration."""
+
+    def document_converted(self, md_file: dict, html: str, seconds: float):
+        """
+        Called when a markdown file has been converted to HTML.
+
+        Args:
+            md_file: File entry with path, rel_path and anchor
+            html: Converted HTML of the file, after image processing
+            seconds: Time spent reading, converting and processing images
+        """
+
+
+class StatsCollector(ConversionHooks):
+    """Collect stage totals and per-document statistics for a report."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}  # Stage name -> {"seconds": total, "count": calls}
+        self.documents = []
+
+    def stage_finished(self, name: str, seconds: float):
+        with self.lock:
+            stage = self.stages.setdefault(name, {"seconds": 0.0, "count": 0})
+            stage["seconds"] += seconds
+            stage["count"] += 1
+
+    def document_converted(self, md_file: dict, html: str, seconds: float):
+        try:
+            source_bytes = os.path.getsize(md_file["path"])
+        except OSError:
+            source_bytes = None
+        self.documents.append(
+            {
+                "path": md_file["rel_path"],
+                "seconds": seconds,
+                "source_bytes": source_bytes,
+                "html_bytes": len(html.encode("utf-8")),
+            }
+        )
+
+    def report(self) -> dict:
+        """
+        Build the report, with the slowest documents first.
+
+        Returns:
+            Dict with stage totals, document totals and per-document stats
+        """
+        documents = sorted(self.documents, key=lambda doc: doc["seconds"], reverse=True)
+        return {
+            "stages": self.stages,
+            "documents": {
+                "count": len(documents),
+                "seconds": sum(doc["seconds"] for doc in documents),
+                "html_bytes": sum(doc["html_bytes"] for doc in documents),
+            },
+            "per_document": documents,
+        }
+
+    def write_report(self, path: str, slowest: int = 5):
+        """Write the report as JSON and print a short summary."""
+        report = self.report()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+        print(f"\n{'Stage':<10}{'seconds':>10}{'calls':>8}")
+        for name, stage in report["stages"].items():
+            print(f"{name:<10}{stage['seconds']:>10.3f}{stage['count']:>8}")
+        if report["per_document"]:
+            print("Slowest documents:")
+            for doc in report["per_document"][:slowest]:
+                print(
+                    f"  {doc['seconds']:8.3f}s {doc['html_bytes'] / 1024:9.1f} KB  "
+                    f"{doc['path']}"
+                )
+        print(f"Report written to: {path}")
+
+
+class DocsToPDF:
+    GITHUB_CLONE_URL = "https://github.com/{owner}/{repo}.git"
+
+    def __init__(
+        self,
+        jobs: int = 1,
+        cache: Optional[BuildCache] = None,
+        shards: int = 1,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        use_gitignore: bool = True,
+        mirror_dir: Optional[str] = None,
+        renderer: str = DEFAULT_RENDERER,
+        image_dpi: Optional[int] = None,
+        image_quality: int = 85,
+        hooks: Optional[ConversionHooks] = None,
+        executor: Optional[Executor] = None,
+        toc_depth: int = 0,
+    ):
+        """
+        Initialize the converter with a temporary working directory.
+
+        Args:
+            jobs: Number of worker processes used for reading and converting
+                markdown files (0 means one per CPU)
+            cache: Optional build cache for rendered fragments and PDFs
+            shards: Number of chunks rendered by parallel wkhtmltopdf processes
+                and merged afterwards (1 disables sharding, 0 means one chunk
+                per top-level directory)
+            include: Globs of markdown files to include, relative to the source
+                directory (default: all markdown files)
+            exclude: Globs of files and directories to skip
+            use_gitignore: Skip paths ignored by .gitignore files
+            mirror_dir: Directory for persistent local mirrors of GitHub
+                repositories (default: clone into a temporary directory)
+            renderer: Markdown rendering backend, one of RENDERERS
+            image_dpi: Downscale images wider than the page at this DPI and
+                recompress them, requires Pillow (default: keep images as is)
+            image_quality: JPEG quality used when recompressing images
+            hooks: Optional instrumentation hooks, see ConversionHooks
+            executor: Process pool to convert markdown files in when jobs is
+                more than 1, shared between converters in batch mode
+                (default: a new pool for each conversion)
+            toc_depth: Include headings down to this level (1-6) below each
+                file in the table of contents (default: files only)
+        """
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_dir = None  # For storing cloned repository path
+        self.mirror_dir = mirror_dir
+        self.mirror_path = None  # Mirror the repository worktree belongs to
+        self.renderer = renderer
+        get_renderer(renderer)  # Fail early if the backend is unavailable
+        self.image_dpi = image_dpi
+        if image_dpi:
+            load_pillow()  # Fail early if Pillow is unavailable
+        self.image_quality = image_quality
+        self.assets = {}  # (path, mtime, size) of a source image -> asset URI
+        self.asset_paths = set()  # Local images referenced, watched in watch mode
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.cache = cache
+        self.shards = shards
+        self.include = [compile_glob(pattern) for pattern in include or []]
+        self.exclude = [compile_glob(pattern) for pattern in exclude or []]
+        self.use_gitignore = use_gitignore
+        self.rendered = None  # HTML per file path, kept in memory in watch mode
+        self.hooks = hooks or ConversionHooks()
+        self.executor = executor
+        self.toc_depth = toc_depth
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a stage of the conversion and report it to the hooks."""
+        self.hooks.stage_started(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.hooks.stage_finished(name, time.perf_counter() - start)
+
+    @contextmanager
+    def shared_pool(self):
+        """
+        Convert markdown in one process pool across several iter_html calls.
+
+        Unless a pool was given, one is created for the duration and used by
+        iter_html through self.executor. Its workers are forked when the first
+        batch is submitted, before any shard is being rendered, and are not
+        started again for every shard.
+        """
+        if self.executor is not None or self.jobs <= 1:
+            yield
+            return
+        self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+        try:
+            yield
+        finally:
+            self.executor.shutdown()
+            self.executor = None
+
+    def cleanup(self):
+        """Clean up temporary directories."""
+        if self.temp_dir and os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+        if self.repo_dir and os.path.exists(self.repo_dir):
+            shutil.rmtree(self.repo_dir, ignore_errors=True)
+        if self.mirror_path:
+            # Drop the worktree metadata of the removed checkout
+            subprocess.run(
+                ["git", "-C", self.mirror_path, "worktree", "prune"],
+                capture_output=True,
+            )
+
+    @staticmethod
+    def parse_github_url(url: str) -> Tuple[str, str, str, str]:
+        """
+        Parse GitHub URL to extract owner, repo, branch and path.
+
+        Args:
+            url: GitHub URL
+
+        Returns:
+            Tuple of (owner, repo, branch, path)
+        """
+        # Remove 'https://github.com/' from the start
+        path = url.replace("https://github.com/", "")
+
+        # Split the remaining path
+        parts = path.split("/")
+
+        owner = parts[0]
+        repo = parts[1]
+
+        # Find where the branch definition starts
+        if "tree" in parts:
+            tree_index = parts.index("tree")
+            branch = parts[tree_index + 1]
+            # Path is everything after the branch
+            docs_path = "/".join(parts[tree_index + 2 :])
+        else:
+            # If no branch is specified, assume 'main' or 'master'
+            branch = "main"
+            docs_path = "/".join(parts[3:]) if len(parts) > 3 else ""
+
+        return owner, repo, branch, docs_path
+
+    @staticmethod
+    def run_git(*args: str) -> str:
+        """Run a git command and return its output."""
+        result = subprocess.run(
+            ["git", *args], check=True, capture_output=True, text=True
+        )
+        return result.stdout
+
+    def update_mirror(self, clone_url: str, owner: str, repo: str, branch: str) -> str:
+        """
+        Create or incrementally update the local mirror of a repository.
+
+        Mirrors are bare, blobless partial clones, so only commits and trees
+        are transferred up front. File contents are fetched on demand when
+        they are checked out, and stay in the mirror for later runs.
+
+        Returns:
+            Path of the mirror repository
+        """
+        mirror = os.path.join(self.mirror_dir, owner, f"{repo}.git")
+        os.makedirs(os.path.dirname(mirror), exist_ok=True)
+
+        with open(mirror + ".lock", "w") as lock:
+            if fcntl is not None:
+                # Serialize updates of the same mirror across processes
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+            if not os.path.isdir(mirror):
+                print(f"Creating mirror of {owner}/{repo}...")
+                tmp_mirror = tempfile.mkdtemp(dir=os.path.dirname(mirror))
+                try:
+                    self.run_git(
+                        "clone",
+                        "--bare",
+                        "--filter=blob:none",
+                        "--single-branch",
+                        "-b",
+                        branch,
+                        clone_url,
+                        tmp_mirror,
+                    )
+                    os.replace(tmp_mirror, mirror)
+                finally:
+                    shutil.rmtree(tmp_mirror, ignore_errors=True)
+            else:
+                print(f"Fetching updates for {owner}/{repo}...")
+                self.run_git(
+                    "-C",
+                    mirror,
+                    "fetch",
+                    "--filter=blob:none",
+                    "--prune",
+                    clone_url,
+                    f"+refs/heads/{branch}:refs/heads/{branch}",
+                )
+
+        return mirror
+
+    def clone_repository(self, github_url: str) -> str:
+        """
+        Check out the documentation of a GitHub repository to a temporary
+        directory.
+
+        Only the docs path is checked out, using a sparse checkout of a
+        blobless partial clone. When a mirror directory is configured, the
+        checkout is a worktree of a persistent local mirror that is fetched
+        incrementally, so later runs only transfer new objects.
+
+        Args:
+            github_url: GitHub repository URL
+
+        Returns:
+            Path of the documentation in the checkout
+        """
+        try:
+            owner, repo, branch, docs_path = self.parse_github_url(github_url)
+            clone_url = self.GITHUB_CLONE_URL.format(owner=owner, repo=repo)
+
+            # Create temporary directory for the repository
+            self.repo_dir = tempfile.mkdtemp()
+
+            if self.mirror_dir:
+                self.mirror_path = self.update_mirror(clone_url, owner, repo, branch)
+                self.run_git(
+                    "-C",
+                    self.mirror_path,
+                    "worktree",
+                    "add",
+                    "--no-checkout",
+                    "--detach",
+                    self.repo_dir,
+                    f"refs/heads/{branch}",
+                )
+            else:
+                print(f"Cloning repository {owner}/{repo}...")
+                self.run_git(
+                    "clone",
+                    "--filter=blob:none",
+                    "--no-checkout",
+                    "--depth",
+                    "1",
+                    "-b",
+                    branch,
+                    clone_url,
+                    self.repo_dir,
+                )
+
+            # Limit the checkout to the docs path, fetching only its blobs
+            print(f"Checking out {docs_path or 'repository'}...")
+            if docs_path:
+                self.run_git(
+                    "-C", self.repo_dir, "sparse-checkout", "set", "--cone", docs_path
+                )
+            self.run_git("-C", self.repo_dir, "checkout")
+
+            # Construct full docs path
+            full_docs_path = os.path.join(self.repo_dir, docs_path)
+
+            if not os.path.exists(full_docs_path):
+                raise Exception(f"Documentation path not found: {docs_path}")
+
+            return full_docs_path
+
+        except subprocess.CalledProcessError as e:
+            raise Exception(f"Failed to clone repository: {e.stderr}") from e
+        except Exception as e:
+            raise Exception(f"Error cloning repository: {str(e)}") from e
+
+    def walk_markdown_files(self, base_path: str) -> Iterator[dict]:
+        """
+        Lazily walk the given directory and yield markdown files.
+
+        Entries are visited depth-first in name order, so files come out in
+        the same order as a sorted recursive listing. Directories that never
+        hold documentation, excluded directories and paths ignored by
+        .gitignore are pruned without descending into them.
+        """
+        base_path = os.path.abspath(base_path)
+
+        rules = []
+        if self.use_gitignore:
+            # Pick up .gitignore files above the source directory within its
+            # repo. In worktrees and submodules, .git is a file
+            parent = base_path
+            ancestors = []
+            while not os.path.exists(os.path.join(parent, ".git")):
+                parent, child = os.path.dirname(parent), parent
+                if parent == child:
+                    ancestors = []
+                    break
+                ancestors.append(parent)
+            for ancestor in reversed(ancestors):
+                rules.extend(load_gitignore(ancestor))
+
+        def is_skipped(entry: os.DirEntry, rules: list, is_dir: bool) -> bool:
+            rel_path = os.path.relpath(entry.path, base_path).replace(os.sep, "/")
+            if any(regex.match(rel_path) for regex in self.exclude):
+                return True
+            if not is_dir and self.include:
+                if not any(regex.match(rel_path) for regex in self.include):
+                    return True
+            return is_ignored(rules, entry.path, is_dir)
+
+        def walk(directory: str, rules: list) -> Iterator[os.DirEntry]:
+            if self.use_gitignore:
+                rules = rules + load_gitignore(directory)
+
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError as e:
+                print(f"Error reading directory {directory}: {str(e)}")
+                return
+
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in PRUNED_DIRS and not is_skipped(
+                        entry, rules, True
+                    ):
+                        yield from walk(entry.path, rules)
+                elif entry.name.lower().endswith(MARKDOWN_SUFFIXES):
+                    if not is_skipped(entry, rules, False):
+                        yield entry
+
+        for index, entry in enumerate(walk(base_path, rules)):
+            yield {
+                "path": entry.path,
+                "rel_path": os.path.relpath(entry.path, base_path),
+                "name": entry.name,
+                "anchor": f"doc_{index}",
+            }
+
+    def find_markdown_files(self, base_path: str) -> list:
+        """
+        Recursively find all markdown files in the given directory.
+        Returns sorted list to maintain consistent ordering.
+        """
+        return list(self.walk_markdown_files(base_path))
+
+    def read_markdown_content(self, markdown_files: list):
+        """Read content from all markdown files."""
+        for md_file in tqdm(
+            markdown_files, total=len(markdown_files), desc="Reading files"
+        ):
+            md_file["content"] = read_file(md_file["path"])
+
+    def create_toc(self, markdown_files: list) -> str:
+        """
+        Create a table of contents in HTML with proper hierarchy.
+
+        Files are nested in their directories, and with toc_depth set, the
+        headings collected during conversion are nested below each file.
+        Built in a single pass over the files.
+        """
+        toc = ["<h1>Table of Contents</h1>", '<ul class="toc">']
+
+        current_dirs = ()
+        for md_file in tqdm(
+            markdown_files, total=len(markdown_files), desc="Creating TOC"
+        ):
+            rel_path = Path(md_file["rel_path"])
+            dirs = rel_path.parent.parts
+
+            # Close the directories that are not shared with the previous file
+            common = 0
+            while (
+                common < min(len(current_dirs), len(dirs))
+                and current_dirs[common] == dirs[common]
+            ):
+                common += 1
+            toc.extend("</ul></li>" for _ in current_dirs[common:])
+            toc.extend(f'<li class="dir">{dir_name}<ul>' for dir_name in dirs[common:])
+            current_dirs = dirs
+
+            file_name = rel_path.stem
+            toc.append(
+                f'<li class="file"><a href="#{md_file["anchor"]}">{file_name}</a>'
+                f'{toc_headings(md_file.get("headings") or [])}</li>'
+            )
+
+        toc.extend("</ul></li>" for _ in current_dirs)
+
+        toc.append("</ul>")
+        return "\n".join(toc)
+
+    def iter_documents(self, markdown_files: list):
+        """
+        Yield HTML document sections for the markdown files, in input order.
+
+        In watch mode, the HTML of every file is kept in memory and only files
+        that are not rendered yet are converted.
+        """
+        if self.rendered is None:
+            for md_file, (html, headings, seconds) in zip(
+                markdown_files, self.iter_html(markdown_files)
+            ):
+                yield self.process_document(md_file, html, headings, seconds)
+            return
+
+        missing = [
+            md_file
+            for md_file in markdown_files
+            if md_file["path"] not in self.rendered
+        ]
+        converted = {}
+        for md_file, (html, headings, seconds) in zip(missing, self.iter_html(missing)):
+            self.rendered[md_file["path"]] = (html, headings)
+            converted[md_file["path"]] = seconds
+        for md_file in markdown_files:
+            html, headings = self.rendered[md_file["path"]]
+            yield self.process_document(
+                md_file, html, headings, converted.get(md_file["path"])
+            )
+
+    def process_document(
+        self, md_file: dict, html: str, headings: list, seconds: Optional[float]
+    ) -> str:
+        """
+        Turn the converted HTML of a markdown file into its document section.
+
+        Images are processed, and with toc_depth set, anchors are made unique
+        and the headings for the TOC are stored in md_file["headings"]. The
+        document is reported to the hooks unless seconds is None, which means
+        it was not converted in this build.
+        """
+        start = time.perf_counter()
+        html = self.process_assets(md_file, html)
+        if self.toc_depth:
+            prefix = md_file["anchor"]
+            html = prefix_anchors(html, prefix)
+            md_file["headings"] = [
+                (level, f"{prefix}-{anchor}", name)
+                for level, anchor, name in headings
+                if level <= self.toc_depth
+            ]
+        if seconds is not None:
+            seconds += time.perf_counter() - start
+            self.hooks.document_converted(md_file, html, seconds)
+        return document_section(md_file, html)
+
+    def iter_html(self, markdown_files: list):
+        """
+        Yield the converted HTML of the markdown files, in input order.
+
+        Each item is a tuple of (html, headings, seconds), see render_timed.
+
+        Each file is read and converted only when its HTML is needed, and
+        its content is not kept afterwards. With more than one job, batches
+        of files are converted in a process pool with a bounded number of
+        batches in flight, so memory use does not grow with the file count.
+        """
+        if self.jobs <= 1 or len(markdown_files) <= 1:
+            for md_file in tqdm(
+                markdown_files, total=len(markdown_files), desc="Converting to HTML"
+            ):
+                yield render_timed(md_file, self.cache, self.renderer)
+            return
+        # Workers read the files themselves, so only paths are pickled
+        batch_size = max(1, min(64, len(markdown_files) // (self.jobs * 4)))
+        batches = (
+            markdown_files[i : i + batch_size]
+            for i in range(0, len(markdown_files), batch_size)
+        )
+        render = partial(render_batch, cache=self.cache, renderer=self.renderer)
+
+        if self.executor is not None:
+            pool = nullcontext(self.executor)
+        else:
+            pool = ProcessPoolExecutor(max_workers=self.jobs)
+
+        with pool as executor, tqdm(
+            total=len(markdown_files), desc=f"Converting to HTML ({self.jobs} jobs)"
+        ) as progress:
+            pending = deque()
+            for batch in batches:
+                pending.append(executor.submit(render, batch))
+                if len(pending) < self.jobs * 2:
+                    continue
+                for result in pending.popleft().result():
+                    progress.update()
+                    yield result
+            while pending:
+                for result in pending.popleft().result():
+                    progress.update()
+                    yield result
+
+    def process_assets(self, md_file: dict, html: str) -> str:
+        """
+        Rewrite local image references in a document to processed assets.
+
+        Relative image paths are resolved against the markdown file. With
+        image_dpi set, images are downscaled and recompressed. With the build
+        cache, images are stored there by content hash, so identical images
+        used on several pages share one file that is decoded and embedded
+        only once, and processed images are kept between runs. Without it,
+        unprocessed images are referenced where they are.
+        """
+        base_dir = os.path.dirname(md_file["path"])
+
+        def replace(match: re.Match) -> str:
+            src = match.group(3)
+            url = urlsplit(src)
+            if url.scheme not in ("", "file") or not url.path:
+                return match.group(0)  # Remote or data URI
+
+            path = unquote(url.path)
+            if url.scheme == "":
+                path = os.path.join(base_dir, path)
+            path = os.path.abspath(path)
+            self.asset_paths.add(path)
+
+            asset = self.get_asset(path)
+            if asset is None:
+                return match.group(0)
+            return f"{match.group(1)}{match.group(2)}{asset}{match.group(2)}"
+
+        return IMG_SRC_RE.sub(replace, html)
+
+    def get_asset(self, path: str) -> Optional[str]:
+        """Return the URI of the processed asset for a local image."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            print(f"Warning: image not found: {path}")
+            return None
+
+        source_key = (path, stat.st_mtime_ns, stat.st_size)
+        if source_key in self.assets:
+            return self.assets[source_key]
+
+        if self.cache is None and not self.image_dpi:
+            # Nothing to process or keep, so the original is used as it is
+            self.assets[source_key] = Path(path).as_uri()
+            return self.assets[source_key]
+
+        with open(path, "rb") as f:
+            data = f.read()
+        suffix = Path(path).suffix.lower()
+
+        if self.cache is None:
+            # Only needed for this run, so named after the source file
+            asset_path = Path(self.temp_dir, "assets", BuildCache.key(path) + suffix)
+            asset_path.parent.mkdir(parents=True, exist_ok=True)
+            max_width = int(PRINTABLE_WIDTH_INCHES * self.image_dpi)
+            asset_path.write_bytes(process_image(data, max_width, self.image_quality))
+        else:
+            key = (
+                BuildCache.key(
+                    hashlib.sha256(data).hexdigest(),
+                    str(self.image_dpi),
+                    str(self.image_quality),
+                )
+                + suffix
+            )
+            asset_path = self.cache.get_asset(key)
+            if asset_path is None:
+                if self.image_dpi:
+                    max_width = int(PRINTABLE_WIDTH_INCHES * self.image_dpi)
+                    data = process_image(data, max_width, self.image_quality)
+                asset_path = self.cache.put_asset(key, data)
+                if not asset_path.exists():
+                    asset_path = Path(path)  # Cache not writable
+
+        self.assets[source_key] = asset_path.as_uri()
+        return self.assets[source_key]
+
+    def write_html(
+        self,
+        markdown_files: list,
+        html_path: str,
+        head: Union[str, Callable[[], str]],
+        tail: str = "",
+    ) -> str:
+        """
+        Write an HTML document with the given head and document sections.
+
+        Document sections are written as they are produced, so the full
+        document is never held in memory. If head is a callable, it is called
+        after all documents are converted, so it can use the headings they
+        contain; the sections are spooled to a temporary file until then.
+
+        Returns:
+            SHA-256 hex digest of the written HTML
+        """
+        digest = hashlib.sha256()
+
+        def write_sections(write: Callable[[str], None]):
+            for index, html in enumerate(self.iter_documents(markdown_files)):
+                if index:
+                    write("\n")
+                write(html)
+
+        body_path = None
+        if callable(head):
+            body_path = html_path + ".body"
+            with open(body_path, "w", encoding="utf-8") as body:
+                write_sections(body.write)
+            head = head()
+
+        with open(html_path, "w", encoding="utf-8") as f:
+
+            def write(chunk: str):
+                f.write(chunk)
+                digest.update(chunk.encode("utf-8"))
+
+            write(head)
+            if body_path is None:
+                write_sections(write)
+            else:
+                with open(body_path, "r", encoding="utf-8") as body:
+                    for chunk in iter(partial(body.read, 1 << 20), ""):
+                        write(chunk)
+                os.remove(body_path)
+            write(tail + HTML_TAIL.format())
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def render_pdf(html_path: str, pdf_path: str):
+        """Render an HTML file to PDF with wkhtmltopdf."""
+        try:
+            pdfkit.from_file(html_path, pdf_path, options=PDF_OPTIONS)
+        except OSError as e:
+            if "wkhtmltopdf" in str(e):
+                raise Exception(
+                    "wkhtmltopdf is not installed. Please install it first:\n"
+                    "- On Mac: brew install wkhtmltopdf\n"
+                    "- On Linux: sudo apt-get install wkhtmltopdf\n"
+                    "- Or download from: https://wkhtmltopdf.org/downloads.html"
+                ) from e
+            raise
+
+    def render_cached_pdf(self, html_path: str, html_hash: str) -> str:
+        """
+        Render an HTML file to PDF, reusing a cached PDF for identical HTML.
+
+        Returns:
+            Path of the rendered or cached PDF
+        """
+        key = BuildCache.key(json.dumps(PDF_OPTIONS, sort_keys=True), html_hash)
+        if self.cache is not None:
+            cached_pdf = self.cache.get_pdf(key)
+            if cached_pdf is not None:
+                print(f"Reusing cached PDF for unchanged {os.path.basename(html_path)}")
+                return str(cached_pdf)
+
+        pdf_path = os.path.splitext(html_path)[0] + ".pdf"
+        with self.stage("render"):
+            self.render_pdf(html_path, pdf_path)
+        if self.cache is not None:
+            self.cache.put_pdf(key, pdf_path)
+        return pdf_path
+
+    def convert_to_pdf(
+        self, markdown_files: list, output_path: str, title: str = "Documentation"
+    ):
+        """Convert markdown files to a single PDF using pdfkit."""
+        if self.shards != 1:
+            self.convert_to_pdf_sharded(markdown_files, output_path, title)
+        else:
+            # Stream the HTML document to a temporary file, one section at a time
+            temp_html = os.path.join(self.temp_dir, "output.html")
+
+            def head() -> str:
+                with self.stage("toc"):
+                    toc_html = self.create_toc(markdown_files)
+                return HTML_HEAD.format(title=title, toc=toc_html)
+
+            with self.stage("html"):
+                # A TOC with headings can only be built after conversion
+                html_hash = self.write_html(
+                    markdown_files, temp_html, head if self.toc_depth else head()
+                )
+
+            print("Converting HTML to PDF...")
+            pdf_path = self.render_cached_pdf(temp_html, html_hash)
+            shutil.copyfile(pdf_path, output_path)
+
+        if self.cache is not None:
+            self.cache.prune()
+
+    def split_shards(self, markdown_files: list) -> list:
+        """
+        Split markdown files into contiguous shards for parallel rendering.
+
+        Files are grouped by top-level directory, and groups are packed into
+        at most ``self.shards`` shards of roughly equal file count. If there
+        are fewer directories than shards, files are split evenly instead.
+        """
+        groups = []
+        for md_file in markdown_files:
+            parts = Path(md_file["rel_path"]).parts
+            key = parts[0] if len(parts) > 1 else ""
+            if groups and groups[-1][0] == key:
+                groups[-1][1].append(md_file)
+            else:
+                groups.append((key, [md_file]))
+        groups = [files for _, files in groups]
+
+        if self.shards <= 0:
+            return groups
+        if len(groups) < self.shards:
+            groups = [[md_file] for md_file in markdown_files]
+
+        target = len(markdown_files) / self.shards
+        shards = []
+        assigned = 0
+        for files in groups:
+            if not shards or (
+                len(shards) < self.shards and assigned >= target * len(shards)
+            ):
+                shards.append([])
+            shards[-1].extend(files)
+            assigned += len(files)
+
+        return shards
+
+    def convert_to_pdf_sharded(
+        self, markdown_files: list, output_path: str, title: str
+    ):
+        """
+        Render shards of the documentation in parallel and merge them.
+
+        The title page and TOC are rendered as their own piece, and each
+        shard gets a hidden list of links to its anchors so their positions
+        can be read back from the rendered PDF. The list starts and ends with
+        a link to the end of the shard, so a dropped link can be detected.
+        The TOC links and a PDF outline are then rebuilt on the merged
+        document.
+        """
+        load_pypdf()
+
+        shards = self.split_shards(markdown_files)
+
+        def shard_anchors(shard: list) -> list:
+            anchors = []
+            for md_file in shard:
+                anchors.append(md_file["anchor"])
+                anchors.extend(anchor for _, anchor, _ in md_file.get("headings", []))
+            return anchors
+
+        def shard_head(shard: list) -> str:
+            nav = "".join(
+                f'<a href="#{anchor}" style="{HIDDEN_STYLE}">.</a>'
+                for anchor in [SHARD_END, *shard_anchors(shard), SHARD_END]
+            )
+            return HTML_PREAMBLE.format(title=title) + (
+                f'<div style="{HIDDEN_STYLE}">{nav}</div>\n'
+            )
+
+        print(f"Rendering {len(shards)} shards in parallel...")
+        workers = min(len(shards) + 1, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Start rendering each shard as soon as its HTML is written
+            shard_futures = []
+            with self.shared_pool():
+                for index, shard in enumerate(shards):
+                    shard_path = os.path.join(self.temp_dir, f"shard_{index}.html")
+                    # Heading anchors are only known once the shard is converted
+                    head = partial(shard_head, shard)
+                    with self.stage("html"):
+                        shard_hash = self.write_html(
+                            shard,
+                            shard_path,
+                            head if self.toc_depth else head(),
+                            tail=f'<a id="{SHARD_END}"></a>',
+                        )
+                    shard_futures.append(
+                        (
+                            executor.submit(
+                                self.render_cached_pdf, shard_path, shard_hash
+                            ),
+                            shard_anchors(shard),
+                        )
+                    )
+
+            # The TOC is built last, from the headings collected in the shards
+            with self.stage("toc"):
+                toc_html = self.create_toc(markdown_files)
+            toc_anchors = re.findall(r'href="#([^"]+)"', toc_html)
+
+            # The TOC piece links to local placeholders, which makes wkhtmltopdf
+            # emit link annotations that are retargeted after merging
+            placeholders = "".join(
+                f'<a id="toc-{anchor}"></a>' for anchor in toc_anchors
+            )
+            toc_head = HTML_HEAD.format(
+                title=title, toc=toc_html.replace('href="#', 'href="#toc-')
+            )
+            toc_path = os.path.join(self.temp_dir, "toc.html")
+            toc_hash = self.write_html([], toc_path, toc_head + placeholders)
+            toc_future = executor.submit(self.render_cached_pdf, toc_path, toc_hash)
+
+            toc_pdf = toc_future.result()
+            shard_pdfs = [
+                (future.result(), anchors) for future, anchors in shard_futures
+            ]
+
+        print("Merging shards...")
+        with self.stage("merge"):
+            self.merge_shards(
+                markdown_files, toc_pdf, toc_anchors, shard_pdfs, output_path
+            )
+
+    @staticmethod
+    def merge_shards(
+        markdown_files: list,
+        toc_pdf: str,
+        toc_anchors: list,
+        shard_pdfs: list,
+        output_path: str,
+    ):
+        """
+        Merge rendered TOC and shard PDFs into a single PDF.
+
+        Args:
+            markdown_files: All markdown files and their TOC headings, used to
+                build the outline
+            toc_pdf: Path of the rendered title page and TOC
+            toc_anchors: Anchors targeted by the TOC links, in order
+            shard_pdfs: List of (pdf_path, anchors) tuples, where anchors are
+                the targets of the hidden links at the start of the shard,
+                between the two links to its end
+            output_path: Output PDF file path
+        """
+        pypdf = load_pypdf()
+        from pypdf.annotations import Link
+        from pypdf.generic import ArrayObject, Fit, NameObject
+
+        def fit(top) -> Fit:
+            return Fit.xyz(top=float(top)) if top is not None else Fit.fit()
+
+        writer = pypdf.PdfWriter()
+
+        # Add the TOC pages without their placeholder links
+        toc_reader = pypdf.PdfReader(toc_pdf)
+        toc_links = find_internal_links(toc_reader)
+        writer.append(toc_reader, import_outline=False, excluded_fields=["/Annots"])
+
+        # Add the shards, recording where each anchor ended up
+        locations = {}
+        offset = len(toc_reader.pages)
+        for pdf_path, anchors in shard_pdfs:
+            reader = pypdf.PdfReader(pdf_path)
+            nav_links = find_nav_links(reader, len(anchors))
+            if nav_links is None:
+                # Matching them up by position would point at the wrong pages
+                print(
+                    f"Warning: could not find the anchor links of {pdf_path}, "
+                    "its TOC links and outline entries are left out"
+                )
+                nav_links = []
+            for anchor, link in zip(anchors, nav_links[1:-1]):
+                if link["target"] is not None and link["target"][0] is not None:
+                    page_index, top = link["target"]
+                    locations[anchor] = (offset + page_index, top)
+
+            # Drop the hidden links before merging
+            for link in nav_links:
+                page = reader.pages[link["page"]]
+                page[NameObject("/Annots")] = ArrayObject(
+                    annot
+                    for annot in page["/Annots"]
+                    if annot.get_object() is not link["annot"]
+                )
+
+            writer.append(reader, import_outline=False)
+            offset += len(reader.pages)
+
+        # Recreate the TOC links, pointing at the merged pages
+        for link, anchor in zip(toc_links, toc_anchors):
+            if anchor not in locations:
+                continue
+            page_index, top = locations[anchor]
+            writer.add_annotation(
+                link["page"],
+                Link(rect=link["rect"], target_page_index=page_index, fit=fit(top)),
+            )
+
+        # Build the outline with the same hierarchy as the TOC
+        parents = []
+        for md_file in markdown_files:
+            if md_file["anchor"] not in locations:
+                continue
+            page_index, top = locations[md_file["anchor"]]
+            rel_path = Path(md_file["rel_path"])
+            dirs = rel_path.parent.parts
+
+            common = 0
+            while (
+                common < min(len(parents), len(dirs))
+                and parents[common][0] == dirs[common]
+            ):
+                common += 1
+            del parents[common:]
+
+            for dir_name in dirs[common:]:
+                parent = parents[-1][1] if parents else None
+                item = writer.add_outline_item(
+                    dir_name, page_index, parent=parent, fit=fit(top)
+                )
+                parents.append((dir_name, item))
+
+            item = writer.add_outline_item(
+                rel_path.stem,
+                page_index,
+                parent=parents[-1][1] if parents else None,
+                fit=fit(top),
+            )
+
+            # Nest the headings below the file, by heading level
+            levels = [(0, item)]
+            for level, anchor, name in md_file.get("headings", []):
+                if anchor not in locations:
+                    continue
+                while len(levels) > 1 and levels[-1][0] >= level:
+                    levels.pop()
+                page_index, top = locations[anchor]
+                item = writer.add_outline_item(
+                    unescape(name), page_index, parent=levels[-1][1], fit=fit(top)
+                )
+                levels.append((level, item))
+
+        writer.page_mode = "/UseOutlines"
+        with open(output_path, "wb") as f:
+            writer.write(f)
+
+    def watch(
+        self,
+        input_path: str,
+        output_path: str,
+        title: str,
+        debounce: float = 0.2,
+        poll_interval: float = 1.0,
+    ):
+        """
+        Rebuild the PDF whenever markdown files below input_path or the images
+        they reference change.
+
+        Converted HTML is kept in memory between builds, and only files whose
+        size or modification time changed are converted again. Runs until
+        interrupted with Ctrl+C.
+        """
+
+        def stat_paths(paths) -> dict:
+            stats = {}
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                    stats[path] = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    stats[path] = None
+            return stats
+
+        self.rendered = {}
+        snapshot = {}
+        image_snapshot = {}  # Images referenced in the last build
+        built = False
+        watcher = DirectoryWatcher(input_path, poll_interval=poll_interval)
+
+        try:
+            while True:
+                start = time.monotonic()
+                with self.stage("find"):
+                    markdown_files = self.find_markdown_files(input_path)
+
+                current = stat_paths(md_file["path"] for md_file in markdown_files)
+                changed = {
+                    path for path in current if snapshot.get(path) != current[path]
+                }
+                changed.update(set(snapshot) - set(current))
+                # Images are processed on every build, so their pages need not
+                # be converted again
+                changed_images = {
+                    path
+                    for path, stat in stat_paths(image_snapshot).items()
+                    if image_snapshot[path] != stat
+                }
+
+                if changed or changed_images or not built:
+                    for path in changed:
+                        self.rendered.pop(path, None)
+                    snapshot = current
+                    built = True
+                    self.asset_paths = set()
+
+                    try:
+                        if not markdown_files:
+                            raise Exception(
+                                "No markdown files found in the specified path"
+                            )
+                        self.convert_to_pdf(markdown_files, output_path, title)
+                        print(
+                            f"Updated {output_path} in {time.monotonic() - start:.2f}s "
+                            f"({len(changed) + len(changed_images)} files changed)"
+                        )
+                    except Exception as e:
+                        print(f"Error: {str(e)}")
+
+                    image_snapshot = stat_paths(self.asset_paths)
+                    watcher.add_files(self.asset_paths)
+                    print(
+                        f"Watching {input_path} for changes ({watcher.mode}), "
+                        "press Ctrl+C to stop..."
+                    )
+
+                watcher.wait(debounce)
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+        finally:
+            watcher.close()
+            self.rendered = None
+
+    def resolve_source(
+        self, source: str, title: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """
+        Resolve a GitHub URL or local path to a local documentation directory.
+
+        GitHub repositories are checked out first; call cleanup() afterwards.
+
+        Returns:
+            Tuple of (input_path, title)
+        """
+        # Determine if source is a GitHub URL or local path
+        if source.startswith("https://github.com"):
+            with self.stage("clone"):
+                input_path = self.clone_repository(source)
+            if title is None:
+                # Extract repo name from URL for title
+                owner, repo, _, _ = self.parse_github_url(source)
+                title = f"{repo} Documentation"
+        else:
+            input_path = os.path.abspath(source)
+            if title is None:
+                title = os.path.basename(input_path.rstrip("/\\")) + " Documentation"
+
+        print(f"Processing documentation in: {input_path}")
+
+        if not os.path.exists(input_path):
+            raise Exception(f"Input path does not exist: {input_path}")
+
+        return input_path, title
+
+    def compare_renderers(
+        self, source: str, renderers: Optional[List[str]] = None, repeat: int = 3
+    ) -> dict:
+        """
+        Check renderer backends for conformance and compare their throughput.
+
+        Every markdown file in the source is rendered with each backend and the
+        output is compared against the default backend after normalization
+        (see normalize_html). Throughput is the best of ``repeat`` passes.
+
+        Args:
+            source: GitHub URL or local path
+            renderers: Backends to compare (default: all installed backends)
+            repeat: Number of timed passes per backend
+
+        Returns:
+            Dict of backend name to a dict with docs_per_sec, mb_per_sec and
+            the list of mismatching files
+        """
+        try:
+            input_path, _ = self.resolve_source(source)
+            markdown_files = self.find_markdown_files(input_path)
+            if not markdown_files:
+                raise Exception("No markdown files found in the specified path")
+            contents = [read_file(md_file["path"]) for md_file in markdown_files]
+            size_mb = sum(len(content.encode("utf-8")) for content in contents) / 1e6
+
+            if renderers is None:
+                renderers = []
+                for name in RENDERERS:
+                    try:
+                        get_renderer(name)
+                        renderers.append(name)
+                    except Exception as e:
+                        print(f"Skipping {name}: {str(e).splitlines()[0]}")
+
+            reference = [
+                normalize_html(get_renderer().render(content)) for content in contents
+            ]
+
+            results = {}
+            for name in renderers:
+                backend = get_renderer(name)
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    outputs = [backend.render(content) for content in contents]
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+
+                mismatches = [
+                    md_file["rel_path"]
+                    for md_file, html, expected in zip(
+                        markdown_files, outputs, reference
+                    )
+                    if normalize_html(html) != expected
+                ]
+                results[name] = {
+                    "docs_per_sec": len(contents) / best if best else float("inf"),
+                    "mb_per_sec": size_mb / best if best else float("inf"),
+                    "mismatches": mismatches,
+                }
+
+            print(f"\n{'Renderer':<14}{'docs/s':>12}{'MB/s':>10}{'conformance':>16}")
+            for name, result in results.items():
+                matching = len(contents) - len(result["mismatches"])
+                print(
+                    f"{name:<14}{result['docs_per_sec']:>12.1f}"
+                    f"{result['mb_per_sec']:>10.2f}"
+                    f"{f'{matching}/{len(contents)} files':>16}"
+                )
+            for name, result in results.items():
+                for rel_path in result["mismatches"][:10]:
+                    print(f"  {name}: output differs for {rel_path}")
+                if len(result["mismatches"]) > 10:
+                    print(f"  {name}: ... and {len(result['mismatches']) - 10} more")
+
+            return results
+        finally:
+            self.cleanup()
+
+    def convert(
+        self,
+        source: str,
+        output_path: str,
+        title: Optional[str] = None,
+        watch: bool = False,
+    ):
+        """
+        Convert documentation to PDF from either GitHub URL or local path.
+
+        Args:
+            source: GitHub URL or local path
+            output_path: Output PDF file path
+            title: Optional title for the documentation
+            watch: Keep running and rebuild the PDF when local files change
+        """
+        try:
+            if watch and source.startswith("https://github.com"):
+                raise Exception("Watch mode requires a local source directory")
+            input_path, title = self.resolve_source(source, title)
+
+            if watch:
+                self.watch(input_path, output_path, title)
+                return
+
+            # Find all markdown files
+            with self.stage("find"):
+                markdown_files = list(
+                    tqdm(
+                        self.walk_markdown_files(input_path),
+                        desc="Finding markdown files",
+                        unit=" files",
+                    )
+                )
+
+            if not markdown_files:
+                raise Exception("No markdown files found in the specified path")
+
+            # Convert to PDF
+            print(f"Converting {len(markdown_files)} files to PDF...")
+            self.convert_to_pdf(markdown_files, output_path, title)
+
+            print(f"PDF successfully created at: {output_path}")
+
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            raise
+        finally:
+            self.cleanup()
+
+
+def load_manifest(path: str) -> list:
+    """
+    Load a batch manifest.
+
+    The manifest is a JSON list of objects with a "source" (GitHub URL or
+    local path), an "output" PDF path and an optional "title".
+
+    Returns:
+        List of manifest entries
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError) as e:
+        raise Exception(f"Could not read manifest {path}: {str(e)}") from e
+
+    if not isinstance(entries, list):
+        raise Exception(f"Manifest {path} must contain a list of sources")
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not entry.get("source"):
+            raise Exception(f"Manifest entry {index} has no source")
+        if not entry.get("output"):
+            raise Exception(f"Manifest entry {index} has no output")
+    return entries
+
+
+def entry_path(path: str, index: int, entry: dict) -> str:
+    """
+    Derive the file of one batch entry from a file name given for the batch.
+
+    The entry's position and output name are added before the extension, so
+    stats.json becomes e.g. stats-2-guide.json for the second entry.
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}-{index + 1}-{Path(entry['output']).stem}{ext}"
+
+
+def convert_batch(
+    entries: list,
+    workers: int = 2,
+    jobs: int = 1,
+    report: Optional[str] = None,
+    profile: Optional[str] = None,
+    **options,
+) -> list:
+    """
+    Convert several sources concurrently in one process.
+
+    Each source gets its own DocsToPDF instance, run in a pool of ``workers``
+    threads, so cloning, markdown conversion and wkhtmltopdf rendering of
+    different sources overlap. With more than one job, all converters share
+    a single process pool for markdown conversion. A failing source is
+    reported and does not stop the others.
+
+    Args:
+        entries: Manifest entries, see load_manifest
+        workers: Number of sources converted at the same time
+        jobs: Number of worker processes in the shared conversion pool
+            (0 means one per CPU)
+        report: Write a StatsCollector report per source, named after this
+            path with entry_path
+        profile: Profile the conversion of each source in its thread and save
+            the stats per source, named after this path with entry_path
+        **options: Further DocsToPDF arguments, such as cache and renderer
+
+    Returns:
+        List of result dicts with source, output, seconds and error (None
+        on success), in manifest order
+    """
+    jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+    if profile and workers > 1 and sys.version_info >= (3, 12):
+        print("Python 3.12+ profiles one thread at a time, converting sources in turn")
+        workers = 1
+
+    def convert_entry(index: int, entry: dict) -> dict:
+        start = time.perf_counter()
+        error = None
+        stats = StatsCollector() if report else None
+        profiler = cProfile.Profile() if profile else None
+        entry_options = dict(options, hooks=stats) if stats else options
+        try:
+            converter = DocsToPDF(jobs=jobs, executor=process_pool, **entry_options)
+            if profiler:
+                profiler.enable()
+            try:
+                converter.convert(entry["source"], entry["output"], entry.get("title"))
+            finally:
+                if profiler:
+                    profiler.disable()
+        except Exception as e:
+            error = str(e)
+        return {
+            "source": entry["source"],
+            "output": entry["output"],
+            "seconds": time.perf_counter() - start,
+            "error": error,
+            "stats": stats,
+            "profiler": profiler,
+        }
+
+    process_pool = None
+    if jobs > 1:
+        # Forking while converter threads are running is unsafe, so start
+        # conversion workers from a clean server process where available
+        context = None
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+        process_pool = ProcessPoolExecutor(max_workers=jobs, mp_context=context)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = list(executor.map(convert_entry, itertools.count(), entries))
+    finally:
+        if process_pool is not None:
+            process_pool.shutdown()
+
+    # Written afterwards, so the summaries of concurrent sources do not mix
+    for index, (entry, result) in enumerate(zip(entries, results)):
+        stats, profiler = result.pop("stats"), result.pop("profiler")
+        if stats:
+            print(f"\nReport for {entry['source']}:")
+            stats.write_report(entry_path(report, index, entry))
+        if profiler:
+            profiler.dump_stats(entry_path(profile, index, entry))
+            print(f"Profile written to: {entry_path(profile, index, entry)}")
+
+    failed = [result for result in results if result["error"] is not None]
+    print(f"\nConverted {len(results) - len(failed)} of {len(results)} sources:")
+    for result in results:
+        status = "FAILED" if result["error"] is not None else "ok"
+        print(f"  {status:<8}{result['seconds']:>8.1f}s  {result['source']}")
+        if result["error"] is not None:
+            print(f"          {result['error'].splitlines()[0]}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert markdown documentation to PDF from GitHub repository or local folder."
+    )
+    parser.add_argument(
+        "source",
+        nargs="?",
+        help="GitHub repository URL (https://github.com/user/repo/tree/branch/docs) or local folder path",
+    )
+    parser.add_argument(
+        "output",
+        nargs="?",
+        help="Output PDF file path (not needed with --compare-renderers)",
+    )
+    parser.add_argument("--title", help="Custom title for the documentation (optional)")
+    parser.add_argument(
+        "--toc-depth",
+        type=int,
+        choices=range(7),
+        default=0,
+        metavar="DEPTH",
+        help="Include headings down to this level (1-6) below each file in the "
+        "table of contents (default: 0, files only)",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="MANIFEST",
+        help="Convert all sources listed in a JSON manifest instead of a single source",
+    )
+    parser.add_argument(
+        "--batch-workers",
+        type=int,
+        default=2,
+        help="Number of sources converted at the same time in batch mode (default: 2)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of worker processes for markdown conversion (default: 1, 0 = all CPUs)",
+    )
+    parser.add_argument(
+        "--renderer",
+        choices=list(RENDERERS),
+        default=DEFAULT_RENDERER,
+        help=f"Markdown rendering backend (default: {DEFAULT_RENDERER})",
+    )
+    parser.add_argument(
+        "--compare-renderers",
+        action="store_true",
+        help="Check installed renderers against the default one on the source and "
+        "compare their throughput, without creating a PDF",
+    )
+    parser.add_argument(
+        "--image-dpi",
+        type=int,
+        help="Downscale images wider than the page to this DPI and recompress them, "
+        "requires Pillow (default: keep images as is)",
+    )
+    parser.add_argument(
+        "--image-quality",
+        type=int,
+        default=85,
+        help="JPEG quality used when recompressing images (default: 85)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and rebuild the PDF when markdown files or their images "
+        "change (local sources only)",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="GLOB",
+        help="Only convert markdown files matching this glob (can be repeated)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        metavar="GLOB",
+        help="Skip files and directories matching this glob (can be repeated)",
+    )
+    parser.add_argument(
+        "--no-gitignore",
+        action="store_true",
+        help="Do not skip paths ignored by .gitignore files",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Render the PDF in N parallel chunks and merge them, requires pypdf "
+        "(default: 1, 0 = one chunk per top-level directory)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help="Directory for the incremental build cache and repository mirrors "
+        f"(default: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE_MB,
+        help=f"Maximum cache size in MB before old entries are evicted (default: {DEFAULT_CACHE_SIZE_MB})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the incremental build cache and repository mirrors",
+    )
+    parser.add_argument(
+        "--report",
+        metavar="FILE",
+        help="Write stage timings and per-document conversion times and sizes "
+        "to a JSON file (one file per source with --batch)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="Profile the conversion with cProfile and save the stats to FILE "
+        "(one file per source with --batch; worker processes are not profiled, "
+        "use with --jobs 1)",
+    )
+
+    args = parser.parse_args()
+    if args.batch:
+        if args.source or args.output:
+            parser.error("source and output are read from the manifest with --batch")
+        if args.watch or args.compare_renderers:
+            parser.error(
+                "--batch cannot be combined with --watch or --compare-renderers"
+            )
+    elif args.source is None:
+        parser.error("the following arguments are required: source")
+    elif args.output is None and not args.compare_renderers:
+        parser.error("the following arguments are required: output")
+
+    cache = None
+    mirror_dir = None
+    if not args.no_cache:
+        cache = BuildCache(args.cache_dir, max_size=args.cache_size << 20)
+        mirror_dir = os.path.join(args.cache_dir, "repos")
+
+    # In batch mode, each source is reported and profiled in its own thread
+    stats = StatsCollector() if args.report and not args.batch else None
+    profiler = cProfile.Profile() if args.profile and not args.batch else None
+
+    try:
+        options = dict(
+            cache=cache,
+            shards=args.shards,
+            include=args.include,
+            exclude=args.exclude,
+            use_gitignore=not args.no_gitignore,
+            mirror_dir=mirror_dir,
+            renderer=args.renderer,
+            image_dpi=args.image_dpi,
+            image_quality=args.image_quality,
+            hooks=stats,
+            toc_depth=args.toc_depth,
+        )
+        entries = load_manifest(args.batch) if args.batch else None
+        converter = None if args.batch else DocsToPDF(jobs=args.jobs, **options)
+        if profiler:
+            profiler.enable()
+        try:
+            if args.batch:
+                results = convert_batch(
+                    entries,
+                    workers=args.batch_workers,
+                    jobs=args.jobs,
+                    report=args.report,
+                    profile=args.profile,
+                    **options,
+                )
+                if any(result["error"] is not None for result in results):
+                    sys.exit(1)
+            elif args.compare_renderers:
+                converter.compare_renderers(args.source)
+            else:
+                converter.convert(
+                    args.source, args.output, args.title, watch=args.watch
+                )
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(args.profile)
+                print(
+                    f"Profile written to: {args.profile} (view with: python -m pstats {args.profile})"
+                )
+            if stats:
+                stats.write_report(args.report)
     except Exception as e:
         print(f"Error: {str(e)}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,134 @@
+import json
+import shutil
+
+import docs_to_pdf
+from docs_to_pdf import DocsToPDF, convert_batch
+
+SOURCES = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot"]
+
+
+def write_source(path, name, files=20, blocks=30):
+    """Write a source whose fenced code blocks all name it"""
+    path.mkdir()
+    for index in range(files):
+        sections = [f"# {name} {index}"]
+        for block in range(blocks):
+            sections.append(f"Text of {name}.\n\n```\nmarker-{name}-{block}\n```")
+        (path / f"doc_{index}.md").write_text("\n\n".join(sections) + "\n")
+
+
+def test_batch_outputs_only_contain_their_own_source(tmp_path, monkeypatch):
+    # Keep the HTML as the "PDF", so the output can be inspected
+    monkeypatch.setattr(
+        DocsToPDF, "render_pdf", staticmethod(lambda html, pdf: shutil.copy(html, pdf))
+    )
+    entries = []
+    for name in SOURCES:
+        write_source(tmp_path / name, name)
+        entries.append(
+            {"source": str(tmp_path / name), "output": str(tmp_path / f"{name}.pdf")}
+        )
+
+    results = convert_batch(entries, workers=len(SOURCES), jobs=1)
+
+    assert [result["error"] for result in results] == [None] * len(SOURCES)
+    for name in SOURCES:
+        output = (tmp_path / f"{name}.pdf").read_text()
+        assert output.count(f"marker-{name}-") == 20 * 30
+        for other in SOURCES:
+            if other != name:
+                assert f"marker-{other}-" not in output
+
+
+def test_renderers_are_not_shared_between_threads():
+    renderers = []
+
+    def collect():
+        renderers.append(docs_to_pdf.get_renderer())
+
+    threads = [docs_to_pdf.threading.Thread(target=collect) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert renderers[0] is not renderers[1]
+    assert docs_to_pdf.get_renderer() is docs_to_pdf.get_renderer()
+
+
+def test_load_manifest(tmp_path):
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps([{"source": "docs", "output": "docs.pdf"}]))
+    assert docs_to_pdf.load_manifest(str(manifest))[0]["output"] == "docs.pdf"
+
+
+def write_shard(path, targets):
+    """Write a three-page PDF with links to (page, top) targets on its first page"""
+    from pypdf import PdfWriter
+    from pypdf.annotations import Link
+    from pypdf.generic import Fit
+
+    writer = PdfWriter()
+    for _ in range(3):
+        writer.add_blank_page(612, 792)
+    for index, (page, top) in enumerate(targets):
+        rect = (10, 700 - index * 10, 20, 705 - index * 10)
+        writer.add_annotation(
+            0, Link(rect=rect, target_page_index=page, fit=Fit.xyz(top=top))
+        )
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def merged_outline(tmp_path, targets):
+    from pypdf import PdfReader
+
+    toc = write_shard(tmp_path / "toc.pdf", [])
+    shard = write_shard(tmp_path / "shard.pdf", targets)
+    markdown_files = [
+        {"anchor": "doc_0", "rel_path": "guide.md", "headings": [(1, "doc_0-a", "A")]}
+    ]
+    output = tmp_path / "out.pdf"
+    DocsToPDF.merge_shards(
+        markdown_files, toc, [], [(shard, ["doc_0", "doc_0-a"])], str(output)
+    )
+    reader = PdfReader(output)
+
+    def flatten(items):
+        for item in items:
+            if isinstance(item, list):
+                yield from flatten(item)
+            else:
+                yield item.title, reader.get_destination_page_number(item)
+
+    return list(flatten(reader.outline))
+
+
+def test_merge_shards_places_anchors_between_the_end_links(tmp_path):
+    end = (2, 300)
+    outline = merged_outline(tmp_path, [end, (0, 700), (1, 500), end, (2, 100)])
+    # Shard pages follow the three TOC pages
+    assert outline == [("guide", 3), ("A", 4)]
+
+
+def test_merge_shards_skips_a_shard_with_a_missing_link(tmp_path, capsys):
+    end = (2, 300)
+    # The link to doc_0 was dropped, so doc_0-a would be taken for it
+    outline = merged_outline(tmp_path, [end, (1, 500), end, (2, 100)])
+    assert outline == []
+    assert "could not find the anchor links" in capsys.readouterr().out
+
+
+def test_walk_uses_gitignore_of_worktree_root(tmp_path):
+    # In a worktree or submodule, .git is a file pointing at the git directory
+    (tmp_path / ".git").write_text("gitdir: /elsewhere/.git/worktrees/docs\n")
+    (tmp_path / ".gitignore").write_text("draft.md\n")
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "guide.md").write_text("# Guide\n")
+    (docs / "draft.md").write_text("# Draft\n")
+
+    files = DocsToPDF().walk_markdown_files(str(docs))
+
+    assert [md_file["rel_path"] for md_file in files] == ["guide.md"]